@@ -21,13 +21,13 @@ second pass eats the tokens to produce the syntax analysis.
 
 This file is organized in parts following those stages:
 
-File parsing (line 99)
-Tokens (line 147)
-Utilities (line 285)
-Structure (line 423)
-Statements (line 603)
-Expressions (line 789)
-Analysis (line 966)
+File parsing (line 103)
+Tokens (line 151)
+Utilities (line 305)
+Structure (line 479)
+Statements (line 648)
+Expressions (line 814)
+Analysis (line 979)
 
 # Jack syntax specifications:
 
@@ -90,8 +90,12 @@ subroutineCall: subroutineName '(' expressionList ')'
 term: integerConstant | stringConstant | keywordConstant | varName
     | varName'['expression']' | subroutineCall | '('expression')' | unaryOp term
 """
+import os
 import re
 import sys
+from array import array
+from functools import lru_cache, partial
+from multiprocessing import Pool
 from pathlib import Path
 
 
@@ -148,9 +152,23 @@ def read_file(path):
 ########
 
 
-def is_blank(c):
-    """Test if one character is blank"""
-    return re.match('\s', c) is not None
+# Token types, indexed by the codes stored in the `types` array of the tokens
+TOKEN_TYPES = ('symbol', 'integerConstant', 'stringConstant', 'identifier', 
+    'keyword')
+SYMBOL, INTEGER_CONSTANT, STRING_CONSTANT, IDENTIFIER, KEYWORD = range(5)
+TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+
+# Alternations of the grammar, as accepted by `eat_by_value`
+PRIMITIVE_TYPES = 'int|char|boolean|void'
+CLASS_VAR_KINDS = 'static|field'
+SUBROUTINE_KINDS = 'constructor|function|method'
+OPS = '+|-|*|/|&|&OR|=|>|<'
+UNARY_OPS = '-|~'
+KEYWORD_CONSTANTS = 'true|false|null|this'
+
+_BLANKS = re.compile(r'\s*')
+_DIGITS = re.compile(r'\d*')
+_IDENTIFIER_CHARS = re.compile(r'[_\w]*')
 
 
 def is_symbol(c):
@@ -161,12 +179,12 @@ def is_symbol(c):
 
 
 def is_integer(c):
-    """Test if one character is an integer"""
-    try:
-        int(c)
-        return True
-    except ValueError:
-        return False
+    """Test if one character is an integer
+
+    `str.isdecimal` accepts the same digits as `int`, without raising and 
+    catching an exception for every other character.
+    """
+    return c.isdecimal()
 
 
 def is_string(c):
@@ -182,48 +200,43 @@ def is_keyword(string):
         'if',  'else',  'while',  'return'}
 
 
-def is_identifier_char(c):
-    """Test if a character is valid inside an identifier definition"""
-    return re.match('[_\w]', c) is not None
+def eat_blanks(chars, i):
+    """Return the index of the first non-blank character from `i` onwards"""
+    return _BLANKS.match(chars, i).end()
 
 
-def eat_char(chars):
-    """Return the first character of a string, and the rest"""
-    return chars[0], chars[1:]
-
-
-def eat_integer(chars, first_digit):
-    """Eat an integerConstant
+def eat_integer(chars, i):
+    """Eat an integerConstant starting at index `i`
 
     integerConstant: a integer in the range 0...32767
+
+    Returns:
+        (integer, index of the next character)
     """
-    if not is_integer(chars[0]):
-        return first_digit, chars
-    i=1
-    while is_integer(chars[i]):
-        i += 1
-    if int(first_digit+chars[:i]) > 32767:
+    end = _DIGITS.match(chars, i).end()
+    if int(chars[i:end]) > 32767:
         raise ValueError(f"Found an integerConstant greater than 32767, which "
-        f"is the maximum: `{first_digit+chars[:i]}`.")
-    return first_digit+chars[:i], chars[i:]
+        f"is the maximum: `{chars[i:end]}`.")
+    return chars[i:end], end
 
 
-def eat_string(chars):
-    """Eat a stringConstant
+def eat_string(chars, i):
+    """Eat a stringConstant whose opening '"' is at index `i`
 
     stringConstant: 
         '"' a sequence of Unicode characters, not including double quote or 
         newline '"'
         In token form, the enclosing '"' are omitted.
+
+    Returns:
+        (string, index of the character following the closing '"')
     """
-    i=0
-    while chars[i] != '"':
-        i += 1
-    return chars[:i], chars[i+1:]
+    end = chars.index('"', i+1)
+    return chars[i+1:end], end+1
 
 
-def eat_identifier_or_keyword(chars, first_char):
-    """Eat a identifier or keyword
+def eat_identifier_or_keyword(chars, i):
+    """Eat a identifier or keyword starting at index `i`
 
     identifier:
         A sequence of letters, digits and underscores ('_') not starting with a 
@@ -232,13 +245,12 @@ def eat_identifier_or_keyword(chars, first_char):
         'class' | 'constructor' | 'function' | 'method' | 'field' | 'static' 
         | 'var' | 'int' | 'char' | 'boolean' | 'void' | 'true' | 'false' 
         | 'null' | 'this' | 'let' | 'do' | 'if' | 'else' | 'while' | 'return'
+
+    Returns:
+        (word, index of the next character)
     """
-    if not is_identifier_char(chars[0]):
-        return first_char, chars
-    i=1
-    while is_identifier_char(chars[i]):
-        i += 1
-    return first_char+chars[:i], chars[i:]
+    end = _IDENTIFIER_CHARS.match(chars, i+1).end()
+    return chars[i:end], end
 
 
 def format_token(word, token_type):
@@ -249,36 +261,44 @@ def format_token(word, token_type):
 def tokenize(chars):
     """Recognize and split the individual tokens in `chars`
 
-    Eats `chars` progressively, one character at a time.
+    Eats `chars` progressively, one token at a time, keeping track of the 
+    current position with an index instead of slicing `chars`.
     Infer the type of the current token from its first character and eat the 
-    rest of it.
-
-    The tokens are then returned as a list of xml lines: `<type> token </type>`
+    rest of it. The character classes are scanned with pre-compiled regular 
+    expressions, so that the per-character loops run inside the `re` engine.
+
+    The tokens are returned as a cursor `(types, values, i)` over a struct of 
+    arrays:
+    * `types` holds the token type codes (see `TOKEN_TYPES`) in a compact byte 
+      array
+    * `values` holds the token values, interned so that repeated identifiers 
+      and keywords share a single string object
+    * `i` is the index of the first token left to eat
+    Eating a token only moves the cursor, the arrays are shared and never 
+    copied. Tokens are only formatted as xml lines (`<type> token </type>`) 
+    once eaten.
     """
-    tokens=[]
-    token_type=None
-    left=""
-    while len(chars) > 0:
-        c, chars = eat_char(chars)
-        if is_blank(c):
-            continue
+    types=array('b')
+    values=[]
+    i = eat_blanks(chars, 0)
+    while i < len(chars):
+        c = chars[i]
         if is_symbol(c):
-            tokens += [format_token(c, 'symbol')]
-            continue
-        if is_integer(c):
-            word, chars = eat_integer(chars, c)
-            tokens += [format_token(word, 'integerConstant')]
-            continue
-        if is_string(c):
-            word, chars = eat_string(chars)
-            tokens += [format_token(word, 'stringConstant')]
-            continue
-        word, chars = eat_identifier_or_keyword(chars, c)
-        if is_keyword(word):
-            tokens += [format_token(word, 'keyword')]
+            word, token_type = c, SYMBOL
+            i += 1
+        elif is_integer(c):
+            word, i = eat_integer(chars, i)
+            token_type = INTEGER_CONSTANT
+        elif is_string(c):
+            word, i = eat_string(chars, i)
+            token_type = STRING_CONSTANT
         else:
-            tokens += [format_token(word, 'identifier')]
-    return tokens
+            word, i = eat_identifier_or_keyword(chars, i)
+            token_type = KEYWORD if is_keyword(word) else IDENTIFIER
+        types.append(token_type)
+        values.append(sys.intern(word))
+        i = eat_blanks(chars, i)
+    return types, values, 0
 
 
 ###########
@@ -286,15 +306,17 @@ def tokenize(chars):
 ###########
 
 
-def indent(token, level=1):
-    "Inent a token to specified level with 2 space tabs"""
-    return ' '*2*level + token
+def is_token(tokens, value, type_code):
+    """Test if the first token has the desired value and type code"""
+    types, values, i = tokens
+    return types[i] == type_code and values[i] == value
+
 
+def first_token(tokens):
+    """Return the xml representation of the first token"""
+    types, values, i = tokens
+    return format_token(values[i], TOKEN_TYPES[types[i]])
 
-def is_of_type(t, token):
-    """Test if a token is of desired type"""
-    return (token.split('<')[1].split('>')[0] == t 
-        and token.split('</')[1].split('>')[0] == t)
 
 def delay_token_application(f):
     """Decorate f to make it a "delayed" function waiting for tokens"""
@@ -303,59 +325,82 @@ def delay_token_application(f):
     return helper
 
 
-@delay_token_application
-def eat_by_value(tokens, expected_value, expected_type, n_indent=1, 
-        optional=False):
-    """Eat the specified token from `tokens` and indent it.
+# Escapes of the xml special characters, for the values of symbol tokens
+_ESCAPE = str.maketrans({'<': '&lt;', '>': '&gt;', '&': '&amp;'})
+
+
+@lru_cache(maxsize=None)
+def eat_by_value(expected_value, expected_type, optional=False):
+    """Make an eater of the specified token.
     
-    Individual tokens are parsed following the "<type> value </type>" format.
+    The eated token is formatted following the "<type> value </type>" format.
 
-    To recognise the "|" value, "&OR" should be specified.
+    To recognise the "|" value, "&OR" should be specified. The accepted values 
+    are parsed once, when the eater is made, rather than on each token.
+
+    Eaters are memoized: the grammar rules keep asking for the same few 
+    eaters, which are then only made once. The xml lines of the accepted 
+    tokens are also formatted once, when the eater is made. This is where the 
+    `<`, `>` and `&` symbols are escaped for the xml output: only the values 
+    of symbol tokens are escaped, never those of string constants.
 
     Args:
-        tokens (list): tokens left in the current class
         expected_value (str): desired token value. Multiple acceptable values 
             can be specified with a pipe "|" separator. To recognize the "|" 
             value, "&OR" should be specified.
         expected_type (str): desired token type. Only one type may be specified.
-        n_indent(int): desired indent level
         optional (bool, default=False): Action to do if desired token is not 
             present: If True, return None, else raise an error
     Returns:
-        (indented_token, rest of the tokens)
+        eater taking the `(types, values, i)` cursor on the tokens left in the
+        current class and returning (eated_token, rest of the tokens)
     """
-    values = [v.replace('&OR', '|') for v in expected_value.split('|')]
-    if not any([tokens[0] == format_token(v, expected_type) for v in values]):
-        if optional:
-            return None, tokens
-        raise ValueError(f'Expected {expected_value} {expected_type}'
-            f' found {tokens[0]}')
-    return [indent(tokens[0], n_indent)], tokens[1:]
+    accepted_values = frozenset(
+        v.replace('&OR', '|') for v in expected_value.split('|'))
+    type_code = TYPE_CODES[expected_type]
+    xml_lines = {v: format_token(
+        v.translate(_ESCAPE) if expected_type == 'symbol' else v, 
+        expected_type) for v in accepted_values}
+    def eater(tokens):
+        types, values, i = tokens
+        if types[i] != type_code or values[i] not in accepted_values:
+            if optional:
+                return None, tokens
+            raise ValueError(f'Expected {expected_value} {expected_type}'
+                f' found {first_token(tokens)}')
+        return [xml_lines[values[i]]], (types, values, i+1)
+    return eater
 
 
-@delay_token_application
-def eat_by_type(tokens, expected_type, n_indent=1, optional=False):
-    """Eat the specified token from `tokens` and indent it.
+@lru_cache(maxsize=None)
+def eat_by_type(expected_type, optional=False):
+    """Make an eater of the specified token.
     
-    Individual tokens are parsed following the "<type> value </type>" format.
+    The eated token is formatted following the "<type> value </type>" format. 
+    As in `eat_by_value`, the xml tags are formatted once per eater.
 
     Args:
-        tokens (list): tokens left in the current class
         expected_type (str): desired token type. Multiple types may be 
             specified, separated with pipes "|".
-        n_indent(int): desired indent level
         optional (bool, default=False): Action to do if desired token is not 
             present: If True, return None, else raise an error
         Returns:
-            (indented_token, rest of the tokens)
+            memoized eater taking the `(types, values, i)` cursor on the 
+            tokens left in the current class and returning
+            (eated_token, rest of the tokens)
     """
-    types = expected_type.split('|')
-    if not any([is_of_type(t, tokens[0]) for t in types]):
-        if optional:
-            return None, tokens
-        raise ValueError(f'expected token of type {expected_type}, found '
-            f'{tokens[0]}')
-    return [indent(tokens[0], n_indent)], tokens[1:]
+    tags = {TYPE_CODES[t]: (f'<{t}> ', f' </{t}>')
+        for t in expected_type.split('|')}
+    def eater(tokens):
+        types, values, i = tokens
+        if types[i] not in tags:
+            if optional:
+                return None, tokens
+            raise ValueError(f'expected token of type {expected_type}, found '
+                f'{first_token(tokens)}')
+        opening_tag, closing_tag = tags[types[i]]
+        return [opening_tag + values[i] + closing_tag], (types, values, i+1)
+    return eater
 
 
 @delay_token_application
@@ -378,17 +423,18 @@ def eat_until_none(tokens, *eaters):
     for eater in eaters:
         newly_eated, tokens = eater(tokens)
         if newly_eated is None: break
-        eated_tokens += [newly_eated]
+        eated_tokens.extend(newly_eated)
     while newly_eated is not None:
         for eater in eaters:
             newly_eated, tokens = eater(tokens)
             if newly_eated is None: break
-            eated_tokens += [newly_eated]
-    return sum(eated_tokens, []), tokens
+            eated_tokens.extend(newly_eated)
+    return eated_tokens, tokens
 
 
-def indented_tag(tag_name, expand_none=False):
-    """Wrapping the tokens eated by the decorated function in desired meta-token
+def xml_tag(tag_name, expand_none=False):
+    """Make the decorated function a delayed eater wrapping its xml lines in 
+    the desired meta-token
 
     Ex: applied on `eat_class` with the "class" tag name, cat following outputs:
     '''
@@ -399,22 +445,32 @@ def indented_tag(tag_name, expand_none=False):
     And turn them into:
     '''
     <class>
-      class_token_start
-      ...
-      class_token_end
+    class_token_start
+    ...
+    class_token_end
     </class>
+    '''
+    The lines are indented following the nesting of those meta-tokens once the
+    whole class is analysed, see `indent_lines`.
+
+    As with `delay_token_application`, the decorated function then waits for 
+    tokens: `eat_class(existing_classes)(tokens)`. Both are done by the same 
+    wrapper, avoiding one call per eated syntax element.
     """
+    opening_tag, closing_tag = f'<{tag_name}>', f'</{tag_name}>'
     def decorator(f):
-        def helper(tokens, n_indent, *args, **kwargs):
-            xml_lines, tokens = f(tokens, n_indent+1, *args, **kwargs)
-            if xml_lines is None and expand_none:
-                xml_lines = []
-            if xml_lines is None:
-                return None, tokens
-            return (
-                [indent(f'<{tag_name}>', n_indent)] + 
-                xml_lines + 
-                [indent(f'</{tag_name}>', n_indent)]), tokens
+        def helper(*args, **kwargs):
+            def eater(tokens):
+                xml_lines, tokens = f(tokens, *args, **kwargs)
+                if xml_lines is None and expand_none:
+                    xml_lines = []
+                if xml_lines is None:
+                    return None, tokens
+                tagged_lines = [opening_tag]
+                tagged_lines.extend(xml_lines)
+                tagged_lines.append(closing_tag)
+                return tagged_lines, tokens
+            return eater
         return helper
     return decorator
 
@@ -425,77 +481,77 @@ def indented_tag(tag_name, expand_none=False):
 
 
 @delay_token_application
-def eat_type(tokens, n_indent, existing_classes, optional=False):
+def eat_type(tokens, existing_classes, optional=False):
     """Eat a token corresponding to a type
 
     Recognized syntax:
     'int'|'char'|'boolean'|className
 
     First tries to eat one of the pre-defined types (int / char / boolean).
-    If unsuccessful, look for user-defined classes.
+    If unsuccessful, look for user-defined classes in the `existing_classes` 
+    set.
     """
-    t, tokens =  eat_by_value('int|char|boolean|void','keyword', n_indent, 
+    t, tokens =  eat_by_value(PRIMITIVE_TYPES, 'keyword',
         optional=True)(tokens)
     if t is not None: return t, tokens
-    return eat_by_value('|'.join(existing_classes), 'identifier', n_indent, 
-        optional=optional)(tokens)
+    types, values, i = tokens
+    if types[i] == IDENTIFIER and values[i] in existing_classes:
+        return eat_by_type('identifier')(tokens)
+    if optional:
+        return None, tokens
+    raise ValueError(f'Expected {"|".join(sorted(existing_classes))} '
+        f'identifier found {first_token(tokens)}')
 
 
-@indented_tag('class')
-def eat_class(tokens, n_indent, existing_classes):
+@xml_tag('class')
+def eat_class(tokens, existing_classes):
     """Eat tokens corresponding to a class declaration
     
     Recognized syntax:
     'class' className '{' classVarDec*, subroutineDec* '}'
     
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters( 
-        eat_by_value('class', 'keyword',n_indent),
-        eat_by_type('identifier', n_indent),
-        eat_by_value('{', 'symbol', n_indent),
-        eat_until_none(eat_class_var_dec(n_indent, existing_classes)),
-        eat_until_none(eat_sub_routine_dec(n_indent, existing_classes)),
-        eat_by_value('}', 'symbol', n_indent))(tokens)
+        eat_by_value('class', 'keyword'),
+        eat_by_type('identifier'),
+        eat_by_value('{', 'symbol'),
+        eat_until_none(eat_class_var_dec(existing_classes)),
+        eat_until_none(eat_sub_routine_dec(existing_classes)),
+        eat_by_value('}', 'symbol'))(tokens)
 
 
-@delay_token_application
-@indented_tag('classVarDec')
-def eat_class_var_dec(tokens, n_indent, existing_classes):
+@xml_tag('classVarDec')
+def eat_class_var_dec(tokens, existing_classes):
     """Eat tokens corresponding to class variables declaration
 
     Recognized syntax:
         ('static'|'field') type varName (',' varName)* ';'
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('static|field', 'keyword', n_indent, optional=True),
-        eat_type(n_indent, existing_classes),
-        eat_by_type('identifier', n_indent),
+        eat_by_value(CLASS_VAR_KINDS, 'keyword', optional=True),
+        eat_type(existing_classes),
+        eat_by_type('identifier'),
         eat_until_none(
-            eat_by_value(',', 'symbol', n_indent,optional=True),
-            eat_by_type('identifier', n_indent)),
-        eat_by_value(';', 'symbol', n_indent))(tokens)
+            eat_by_value(',', 'symbol', optional=True),
+            eat_by_type('identifier')),
+        eat_by_value(';', 'symbol'))(tokens)
 
 
-@delay_token_application
-@indented_tag('subroutineDec')
-def eat_sub_routine_dec(tokens, n_indent, existing_classes):
+@xml_tag('subroutineDec')
+def eat_sub_routine_dec(tokens, existing_classes):
     """Eat tokens corresponding to subroutine declarations
 
     Recognized syntax:
@@ -503,100 +559,89 @@ def eat_sub_routine_dec(tokens, n_indent, existing_classes):
              subroutineName '(' parameterList ')' subroutineBody
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('constructor|function|method', 'keyword', n_indent, 
+        eat_by_value(SUBROUTINE_KINDS, 'keyword',
             optional=True),
-        eat_type(n_indent, existing_classes),
-        eat_by_type('identifier', n_indent),
-        eat_by_value('(', 'symbol', n_indent),
-        eat_param_list(n_indent, existing_classes),
-        eat_by_value(')', 'symbol', n_indent),
-        eat_sub_routine_body(n_indent, existing_classes))(tokens)
+        eat_type(existing_classes),
+        eat_by_type('identifier'),
+        eat_by_value('(', 'symbol'),
+        eat_param_list(existing_classes),
+        eat_by_value(')', 'symbol'),
+        eat_sub_routine_body(existing_classes))(tokens)
 
 
-@delay_token_application
-@indented_tag('parameterList', expand_none=True)
-def eat_param_list(tokens, n_indent, existing_classes):
+@xml_tag('parameterList', expand_none=True)
+def eat_param_list(tokens, existing_classes):
     """Eat tokens corresponding to parameter lists
 
     Recognized syntax:
         ((type varName) (',' type varName)*)?
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_type(n_indent, existing_classes, optional=True),
-        eat_by_type('identifier', n_indent),
+        eat_type(existing_classes, optional=True),
+        eat_by_type('identifier'),
         eat_until_none(
-            eat_by_value(',', 'symbol', n_indent, optional=True),
-            eat_type(n_indent, existing_classes),
-            eat_by_type('identifier', n_indent)))(tokens)
+            eat_by_value(',', 'symbol', optional=True),
+            eat_type(existing_classes),
+            eat_by_type('identifier')))(tokens)
 
 
-@delay_token_application
-@indented_tag('subroutineBody')
-def eat_sub_routine_body(tokens, n_indent, existing_classes):
+@xml_tag('subroutineBody')
+def eat_sub_routine_body(tokens, existing_classes):
     """Eat tokens corresponding to a subroutine body
 
     Recognized syntax:
         '{' varDec* statements '}'
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('{', 'symbol', n_indent),
-        eat_until_none(eat_var_dec(n_indent, existing_classes)),
-        eat_statements(n_indent, existing_classes),
-        eat_by_value('}', 'symbol', n_indent))(tokens)
+        eat_by_value('{', 'symbol'),
+        eat_until_none(eat_var_dec(existing_classes)),
+        eat_statements(existing_classes),
+        eat_by_value('}', 'symbol'))(tokens)
 
 
-@delay_token_application
-@indented_tag('varDec')
-def eat_var_dec(tokens, n_indent, existing_classes):
+@xml_tag('varDec')
+def eat_var_dec(tokens, existing_classes):
     """Eat tokens corresponding to variable declarations
 
     Recognized syntax:
         'var' type varName (',' varName)* ';'
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('var', 'keyword', n_indent, optional=True),
-        eat_type(n_indent, existing_classes),
-        eat_by_type('identifier', n_indent),
+        eat_by_value('var', 'keyword', optional=True),
+        eat_type(existing_classes),
+        eat_by_type('identifier'),
         eat_until_none(
-            eat_by_value(',', 'symbol', n_indent, optional=True),
-            eat_by_type('identifier', n_indent)),
-        eat_by_value(';', 'symbol', n_indent))(tokens)
+            eat_by_value(',', 'symbol', optional=True),
+            eat_by_type('identifier')),
+        eat_by_value(';', 'symbol'))(tokens)
 
 
 ############
@@ -604,28 +649,25 @@ def eat_var_dec(tokens, n_indent, existing_classes):
 ############
 
 
-@delay_token_application
-@indented_tag('statements')
-def eat_statements(tokens, n_indent, existing_classes):
+@xml_tag('statements')
+def eat_statements(tokens, existing_classes):
     """Eat tokens corresponding to statements
 
     Recognized syntax:
         statement*
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
-    return eat_until_none(eat_statement(n_indent, existing_classes))(tokens)
+    return eat_until_none(eat_statement(existing_classes))(tokens)
 
 
 @delay_token_application
-def eat_statement(tokens, n_indent, existing_classes):
+def eat_statement(tokens, existing_classes):
     """Eat tokens corresponding to a statement
 
     Recognized syntax:
@@ -633,155 +675,138 @@ def eat_statement(tokens, n_indent, existing_classes):
             | returnStatement
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
-    if tokens[0] == format_token('if', 'keyword'):
-        return eat_if_statement(n_indent, existing_classes)(tokens)
-    if tokens[0] == format_token('while', 'keyword'):
-        return eat_while_statement(n_indent, existing_classes)(tokens)
-    if tokens[0] == format_token('let', 'keyword'):
-        return eat_let_statement(n_indent, existing_classes)(tokens)
-    if tokens[0] == format_token('do', 'keyword'):
-        return eat_do_statement(n_indent)(tokens)
-    if tokens[0] == format_token('return', 'keyword'):
-        return eat_return_statement(n_indent)(tokens)
+    if is_token(tokens, 'if', KEYWORD):
+        return eat_if_statement(existing_classes)(tokens)
+    if is_token(tokens, 'while', KEYWORD):
+        return eat_while_statement(existing_classes)(tokens)
+    if is_token(tokens, 'let', KEYWORD):
+        return eat_let_statement(existing_classes)(tokens)
+    if is_token(tokens, 'do', KEYWORD):
+        return eat_do_statement()(tokens)
+    if is_token(tokens, 'return', KEYWORD):
+        return eat_return_statement()(tokens)
     return None, tokens
 
 
-@delay_token_application
-@indented_tag('ifStatement')
-def eat_if_statement(tokens, n_indent, existing_classes):
+@xml_tag('ifStatement')
+def eat_if_statement(tokens, existing_classes):
     """Eat tokens corresponding to a if statement
 
     Recognized syntax:
         'if' '(' expression ')’ '{' statements '}’ (else '{' statements '})?
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('if', 'keyword', n_indent),
-        eat_by_value('(', 'symbol', n_indent),
-        eat_expression(n_indent, optional=True),
-        eat_by_value(')', 'symbol', n_indent),
-        eat_by_value('{', 'symbol', n_indent),
-        eat_statements(n_indent, existing_classes),
-        eat_by_value('}', 'symbol', n_indent),
-        eat_by_value('else', 'keyword', n_indent, optional=True),
-        eat_by_value('{', 'symbol', n_indent),
-        eat_statements(n_indent, existing_classes),
-        eat_by_value('}', 'symbol', n_indent))(tokens)
-
-
-@delay_token_application
-@indented_tag('whileStatement')
-def eat_while_statement(tokens, n_indent, existing_classes):
+        eat_by_value('if', 'keyword'),
+        eat_by_value('(', 'symbol'),
+        eat_expression(optional=True),
+        eat_by_value(')', 'symbol'),
+        eat_by_value('{', 'symbol'),
+        eat_statements(existing_classes),
+        eat_by_value('}', 'symbol'),
+        eat_by_value('else', 'keyword', optional=True),
+        eat_by_value('{', 'symbol'),
+        eat_statements(existing_classes),
+        eat_by_value('}', 'symbol'))(tokens)
+
+
+@xml_tag('whileStatement')
+def eat_while_statement(tokens, existing_classes):
     """Eat tokens corresponding to a if statement
 
     Recognized syntax:
         'while' '(' expression ')’ '{' statements '}’
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('while', 'keyword', n_indent),
-        eat_by_value('(', 'symbol', n_indent),
-        eat_expression(n_indent, optional=True),
-        eat_by_value(')', 'symbol', n_indent),
-        eat_by_value('{', 'symbol', n_indent),
-        eat_statements(n_indent, existing_classes),
-        eat_by_value('}', 'symbol', n_indent))(tokens)
+        eat_by_value('while', 'keyword'),
+        eat_by_value('(', 'symbol'),
+        eat_expression(optional=True),
+        eat_by_value(')', 'symbol'),
+        eat_by_value('{', 'symbol'),
+        eat_statements(existing_classes),
+        eat_by_value('}', 'symbol'))(tokens)
 
 
-@delay_token_application
-@indented_tag('letStatement')
-def eat_let_statement(tokens, n_indent, existing_classes):
+@xml_tag('letStatement')
+def eat_let_statement(tokens, existing_classes):
     """Eat tokens corresponding to a let statement
 
     Recognized syntax:
         'let' varName '=' expression ';'
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
-        existing_classes (list): list of class names existing in the scope of
+        tokens (tuple): tokens to analyse a class declaration from
+        existing_classes (frozenset): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('let', 'keyword', n_indent),
-        eat_by_type('identifier', n_indent),
+        eat_by_value('let', 'keyword'),
+        eat_by_type('identifier'),
         apply_eaters(
-            eat_by_value('[', 'symbol', n_indent, optional=True),
-            eat_expression(n_indent),
-            eat_by_value(']', 'symbol', n_indent)),
-        eat_by_value('=', 'symbol', n_indent),
-        eat_expression(n_indent),
-        eat_by_value(';', 'symbol', n_indent),
+            eat_by_value('[', 'symbol', optional=True),
+            eat_expression(),
+            eat_by_value(']', 'symbol')),
+        eat_by_value('=', 'symbol'),
+        eat_expression(),
+        eat_by_value(';', 'symbol'),
         break_on_none=False)(tokens)
 
 
-@delay_token_application
-@indented_tag('doStatement')
-def eat_do_statement(tokens, n_indent):
+@xml_tag('doStatement')
+def eat_do_statement(tokens):
     """Eat tokens corresponding to a do statement
 
     Recognized syntax:
         'do' subroutineCall ';'
      
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('do', 'keyword', n_indent),
-        eat_subroutine_call(n_indent),
-        eat_by_value(';', 'symbol', n_indent))(tokens)
+        eat_by_value('do', 'keyword'),
+        eat_subroutine_call(),
+        eat_by_value(';', 'symbol'))(tokens)
 
 
-@delay_token_application
-@indented_tag('returnStatement')
-def eat_return_statement(tokens, n_indent):
+@xml_tag('returnStatement')
+def eat_return_statement(tokens):
     """Eat tokens corresponding to a return statement
 
     Recognized syntax:
         returnStatemen: 'return' expression? ';'
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_by_value('return', 'keyword', n_indent),
-        eat_expression(n_indent, optional=True),
-        eat_by_value(';', 'symbol', n_indent),
+        eat_by_value('return', 'keyword'),
+        eat_expression(optional=True),
+        eat_by_value(';', 'symbol'),
         break_on_none=False)(tokens)
 
 
@@ -790,72 +815,64 @@ def eat_return_statement(tokens, n_indent):
 #############
 
 
-@delay_token_application
-@indented_tag('expressionList', expand_none=True)
-def eat_expression_list(tokens, n_indent):
+@xml_tag('expressionList', expand_none=True)
+def eat_expression_list(tokens):
     """Eat tokens corresponding to a return statement
 
     Recognized syntax:
         (expression (',' expression)*)?
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_expression(n_indent, optional=True),
+        eat_expression(optional=True),
         eat_until_none(
-            eat_by_value(',', 'symbol', n_indent, optional=True),
-            eat_expression(n_indent)))(tokens)
+            eat_by_value(',', 'symbol', optional=True),
+            eat_expression()))(tokens)
 
 
-@delay_token_application
-@indented_tag('expression')
-def eat_expression(tokens, n_indent, optional=False):
+@xml_tag('expression')
+def eat_expression(tokens, optional=False):
     """Eat tokens corresponding to an expression
 
     Recognized syntax:
          term (op term)*
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
     return apply_eaters(
-        eat_term(n_indent, optional=optional),
+        eat_term(optional=optional),
         eat_until_none(
-            eat_op(n_indent, optional=True),
-            eat_term(n_indent)))(tokens)
+            eat_op(optional=True),
+            eat_term()))(tokens)
 
 
 @delay_token_application
-def eat_op(tokens, n_indent, optional=False):
+def eat_op(tokens, optional=False):
     """Eat tokens corresponding to an operation symbol
 
     Recognized syntax:
         '+'|'-'|i'*'|'/'|'&'|'|'|'='|'>'|'<'
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
-    return eat_by_value('+|-|*|/|&|&OR|=|>|<', 'symbol', n_indent, 
+    return eat_by_value(OPS, 'symbol',
         optional=optional)(tokens)
 
 
 @delay_token_application
-def eat_subroutine_call(tokens, n_indent):
+def eat_subroutine_call(tokens):
     """Eat tokens corresponding to a sub-routine call
 
     Recognized syntax:
@@ -863,23 +880,21 @@ def eat_subroutine_call(tokens, n_indent):
             | (className|varname)'.'subroutineName'('expressionList')'
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
     Returns:
-        (indented tokens of the declaration, other tokens)
+        (xml lines of the declaration, other tokens)
     """
-    identifier, tokens = eat_by_type('identifier', n_indent)(tokens)
-    dot, tokens = eat_by_value('.', 'symbol', n_indent, 
+    identifier, tokens = eat_by_type('identifier')(tokens)
+    dot, tokens = eat_by_value('.', 'symbol',
         optional=True)(tokens)
     if dot is not None:
-        f_name, tokens = eat_by_type('identifier', n_indent)(tokens)
+        f_name, tokens = eat_by_type('identifier')(tokens)
     else:
         f_name=None
     f_call, tokens = apply_eaters(
-        eat_by_value('(', 'symbol', n_indent),
-        eat_expression_list(n_indent),
-        eat_by_value(')', 'symbol', n_indent)
+        eat_by_value('(', 'symbol'),
+        eat_expression_list(),
+        eat_by_value(')', 'symbol')
     )(tokens)
 
     func_call = identifier
@@ -889,9 +904,8 @@ def eat_subroutine_call(tokens, n_indent):
     return func_call + f_call, tokens
 
 
-@delay_token_application
-@indented_tag('term')
-def eat_term(tokens, n_indent, optional=False):
+@xml_tag('term')
+def eat_term(tokens, optional=False):
     """Eat tokens corresponding to a term
 
     Recognized syntax:
@@ -900,66 +914,65 @@ def eat_term(tokens, n_indent, optional=False):
             | unaryOp term
 
     Args:
-        tokens (list): tokens to analyse a class declaration from
-        n_indent (int): desired indent level (kept for compatibility with 
-            the indented_tag decorator)
+        tokens (tuple): tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
-        (indented tokens of the declaration, other tokens)
-    """
+        (xml lines of the declaration, other tokens)
 
-    integer_constant, tokens = eat_by_type('integerConstant', n_indent, 
-        optional=True)(tokens)
-    if integer_constant is not None:
-        return integer_constant, tokens 
+    The first token determines which alternative applies: the term is 
+    dispatched on its type instead of trying every alternative in turn.
+    """
+    types, values, i = tokens
+    token_type = types[i]
 
-    string_constant, tokens = eat_by_type('stringConstant', n_indent, 
-        optional=True)(tokens)
-    if string_constant is not None:
-        return string_constant, tokens
+    # integerConstant | stringConstant
+    if token_type == INTEGER_CONSTANT or token_type == STRING_CONSTANT:
+        return eat_by_type(TOKEN_TYPES[token_type])(tokens)
 
     # keywordConstant: 'true'|'false'|'null'|'this'
-    keyword_constant, tokens = eat_by_value('true|false|null|this', 'keyword', 
-        n_indent, optional=True)(tokens)
-    if keyword_constant is not None:
-        return keyword_constant, tokens
+    if token_type == KEYWORD:
+        keyword_constant, tokens = eat_by_value(KEYWORD_CONSTANTS, 'keyword', 
+            optional=True)(tokens)
+        if keyword_constant is not None:
+            return keyword_constant, tokens
 
     # varName|varName'['expression']|subroutineCall'
-    initial_token = tokens[0:1]
-    identifier, tokens = eat_by_type('identifier', n_indent, optional=True)(
-        tokens)
-    if identifier is not None:
-        if tokens[0] == format_token('[', 'symbol'):
+    elif token_type == IDENTIFIER:
+        # Peek at the following symbol: the cursor itself never moves back
+        next_symbol = values[i+1] if types[i+1] == SYMBOL else None
+        if next_symbol == '[':
             return apply_eaters(
-                eat_by_type('identifier', n_indent, optional=True),
-                eat_by_value('[', 'symbol', n_indent),
-                eat_expression(n_indent),
-                eat_by_value(']', 'symbol', n_indent))(initial_token + tokens)
-        if (tokens[0] == format_token('.', 'symbol') 
-                or tokens[0] == format_token('(', 'symbol')):
-            return eat_subroutine_call(n_indent)(initial_token + tokens)
-        return identifier, tokens
+                eat_by_type('identifier', optional=True),
+                eat_by_value('[', 'symbol'),
+                eat_expression(),
+                eat_by_value(']', 'symbol'))(tokens)
+        if next_symbol == '.' or next_symbol == '(':
+            return eat_subroutine_call()(tokens)
+        return eat_by_type('identifier')(tokens)
 
     # '('expression')'
-    expression, tokens = apply_eaters(
-        eat_by_value('(', 'symbol', n_indent, optional=True),
-        eat_expression(n_indent),
-        eat_by_value(')', 'symbol', n_indent))(tokens)
-    if expression is not None:
-        return expression, tokens
+    elif is_token(tokens, '(', SYMBOL):
+        return apply_eaters(
+            eat_by_value('(', 'symbol'),
+            eat_expression(),
+            eat_by_value(')', 'symbol'))(tokens)
 
     # unaryOp term
     # unaryOp: '-'|'~'
-    unary_term, tokens = apply_eaters(
-        eat_by_value('-|~', 'symbol', n_indent, optional=True),
-        eat_term(n_indent))(tokens)
-    if unary_term is not None:
-        return unary_term, tokens
+    elif token_type == SYMBOL:
+        unary_term, tokens = apply_eaters(
+            eat_by_value(UNARY_OPS, 'symbol', optional=True),
+            eat_term())(tokens)
+        if unary_term is not None:
+            return unary_term, tokens
 
     if optional:
         return None, tokens
     
-    raise ValueError(f'Expected a term, found `{tokens[:5]}...`')
+    types, values, i = tokens
+    next_tokens = [format_token(v, TOKEN_TYPES[t]) 
+        for t, v in zip(types[i:i+5], values[i:i+5])]
+    raise ValueError(f'Expected a term, found `{next_tokens}...`')
 
 
 #################
@@ -967,34 +980,74 @@ def eat_term(tokens, n_indent, optional=False):
 #################
 
 
-def post_process(token):
-    return token.replace(
-        '<symbol> < </symbol>', '<symbol> &lt; </symbol>').replace(
-        '<symbol> > </symbol>', '<symbol> &gt; </symbol>').replace(
-        '<symbol> & </symbol>', '<symbol> &amp; </symbol>')
+def indent_lines(xml_lines):
+    """Indent the xml lines following the nesting of their meta-tokens
 
+    Meta-tokens (`<term>`, `</term>`...) are the only lines without spaces, 
+    tokens being formatted as `<type> value </type>`.
+    The content of each meta-token is indented one level further, with 2 space
+    tabs.
 
-def post_process_tokens(tokens):
-    return [post_process(token) for token in tokens]
-
+    The indentation and the line termination are done in one formatting of 
+    each line, ready to be written.
+    """
+    margin = ''
+    for line in xml_lines:
+        if ' ' in line:
+            yield f'{margin}{line}\n'
+        elif line.startswith('</'):
+            margin = margin[2:]
+            yield f'{margin}{line}\n'
+        else:
+            yield f'{margin}{line}\n'
+            margin += '  '
 
-def process_file(file_path, existing_classes):
-    return '\n'.join(post_process_tokens(eat_class(
-       tokenize(read_file(file_path)),0,existing_classes)[0])) + '\n'
 
+def process_file(file_path, existing_classes, output):
+    """Read, tokenize and analyse a file, streaming the xml lines to `output`
 
-project_path = Path(sys.argv[1])
+    Args:
+        file_path (Path): jack file to analyse
+        existing_classes (frozenset): class names existing in the scope of
+            the program. They should thus be recognized as valid data types.
+        output: writable text stream, like an opened file or `sys.stdout`
+    """
+    xml_lines, _ = eat_class(existing_classes)(tokenize(read_file(file_path)))
+    output.writelines(indent_lines(xml_lines))
+
+
+def analyse_file(file_path, existing_classes):
+    """Analyse a jack file into its respective `.comp.xml` file"""
+    output_file = Path(file_path.parent.expanduser() 
+        / file_path.name.replace('.jack', '.comp.xml'))
+    print('Analysing', file_path.name, flush=True)
+    with output_file.open('w') as output:
+        process_file(file_path, existing_classes, output)
+
+
+def main():
+    """Analyse the jack file or folder given on the command line"""
+    project_path = Path(sys.argv[1])
+
+    jack_files = tuple(project_path.parent.glob('*.jack'))
+    existing_classes = frozenset(['String', 'Array'] + [
+        f.name[:-5]
+        for f in jack_files])
+
+    if project_path.is_file(): # Single file translation
+        process_file(project_path, existing_classes, sys.stdout)
+    else: # Folder
+        analyse_jack_file = partial(analyse_file,
+            existing_classes=existing_classes)
+        # The files are independent: they are analysed in parallel, unless
+        # starting the worker processes cannot pay off
+        if len(jack_files) > 1 and (os.cpu_count() or 1) > 1:
+            with Pool() as pool:
+                pool.map(analyse_jack_file, jack_files)
+        else:
+            for file_path in jack_files:
+                analyse_jack_file(file_path)
 
-existing_classes = ['String', 'Array'] + [
-    f.name[:-5]
-    for f in project_path.parent.glob('*.jack')]
 
-if project_path.is_file(): # Single file translation
-    print(process_file(project_path, existing_classes))
-else: # Folder
-    to_process = project_path.parent.glob('*.jack')
-    for file_path in to_process:
-        output_file = Path(file_path.parent.expanduser() 
-            / file_path.name.replace('.jack', '.comp.xml'))
-        print('Analysing', file_path.name)
-        output_file.write_text(process_file(file_path, existing_classes))
+if __name__ == '__main__':
+    main()
@@ -20,22 +20,23 @@ To pass context elements to the various eaters, a "scope" object is used: it
 contains the list of tokens that are yet to be eaten, and various context 
 variables needed for compilation. The scope is passed from one eater to the 
 next. For nested elements (while/if/functions inside one another), a stacking 
-system copies the parent scope for each new child. Writing in the parent scope 
-is thus prevented, except for specific keys (see `unstack_scope`).
+system records the values each child overwrites and restores them once the 
+child is compiled. Writing in the parent scope is thus prevented, except for 
+specific keys (see `unstack_scope`).
 
-The initial jack code is eated once on a character basis to produce tokens. A 
-second pass eats the tokens to produce the vm code.
+The initial jack code is scanned once by a regular expression to produce 
+tokens. A second pass eats the tokens to produce the vm code.
 
 This file is organized in parts following those stages:
 
-File parsing (line 107)
-Tokens (line 155)
-Utilities (line 301)
-Scope (line 414)
-Structure (line 551)
-Statements (line 770)
-Expressions (line 1059)
-Compilation (line 1296)
+File parsing (line 111)
+Tokens (line 158)
+Utilities (line 247)
+Scope (line 380)
+Structure (line 584)
+Statements (line 842)
+Expressions (line 1136)
+Compilation (line 1404)
 
 # Jack syntax specifications:
 
@@ -98,8 +99,11 @@ subroutineCall: subroutineName '(' expressionList ')'
 term: integerConstant | stringConstant | keywordConstant | varName
     | varName'['expression']' | subroutineCall | '('expression')' | unaryOp term
 """
+import os
 import re
 import sys
+from functools import lru_cache, partial
+from multiprocessing import Pool
 from pathlib import Path
 
 
@@ -108,6 +112,10 @@ from pathlib import Path
 ##############
 
 
+# Block comments and line comments, along with the new line ending them
+_COMMENTS = re.compile(r'/\*.*?\*/|//.*?\n', re.DOTALL)
+
+
 def read_file(path):
     """Read file into a string and preprocess it
 
@@ -119,36 +127,31 @@ def read_file(path):
     def read_caracters():
         return Path(path).expanduser().read_text()
 
-    def remove_block_coments(string):
-        """Remove block comments by replacing them with an empty string
+    def remove_comments(string):
+        r"""Remove comments by replacing them with an empty string
 
-        Matches string that:
-        * Start with /*: `/\*`
-        * Containing any caracters, including new lines...: `(.|\s)`
-        * ...0, 1 or multiple times but look for the smallest set: `(...*?)`
-        * And end with */: `\*/`
-        """
-        return re.sub('/\*((.|\s)*?)\*/', '', string)
-
-    def remove_line_comments(string):
-        """Remove line comments by replacing them with a new line character
-        
-        Matches string that:
-        * Start with //: `//`
-        * Containing any caracters except new lines...: `.`
-        * ...0, 1 or multiple times but look for the smallest set: `(...*?)`
-        * And end with a new line: `\n`
+        The source is scanned once, from left to right, and matches strings 
+        that either:
+        * Start with /*, contain any caracters including new lines, and end 
+          with the first following */: `/\*.*?\*/` (`.` matching new lines)
+        * Start with //, contain any caracters, and end with the first 
+          following new line: `//.*?\n`
+
+        Comments are thus matched in the order they open: a `/*` inside a 
+        line comment, or a `//` inside a block comment, is part of that 
+        comment (see the `Comments` example).
         """
-        return re.sub('//(.*?)\n', '\n', string)
+        return _COMMENTS.sub('', string)
 
     def remove_new_lines(string):
-        """Remove new lines by replacing them with an empty string"""
-        return re.sub('(\r)?\n', '', string)
+        """Remove new lines, possibly preceded by a carriage return
+
+        There is one new line per line of code: plain replacements are much 
+        faster than one regex substitution per line.
+        """
+        return string.replace('\r\n', '').replace('\n', '')
 
-    return remove_new_lines(
-        remove_line_comments(
-            remove_block_coments(
-                read_caracters())))
+    return remove_new_lines(remove_comments(read_caracters()))
 
 
 ########
@@ -156,144 +159,87 @@ def read_file(path):
 ########
 
 
-def is_blank(c):
-    """Test if one character is blank"""
-    return re.match('\s', c) is not None
-
-
-def is_symbol(c):
-    """Test if one character is a symbol"""
-    return c in {'{',  '}',  '(',  ')',  '[',  ']',  '.',  
-        ',',  ';',  '+',  '-',  '*',  '/',  '&',  '|',  '<',  
-        '>',  '=',  '~'}
-
-
-def is_integer(c):
-    """Test if one character is an integer"""
-    try:
-        int(c)
-        return True
-    except ValueError:
-        return False
+SYMBOLS = frozenset({'{',  '}',  '(',  ')',  '[',  ']',  '.',  ',',  ';',  '+',
+    '-',  '*',  '/',  '&',  '|',  '<',  '>',  '=',  '~'})
+KEYWORDS = frozenset({'class',  'constructor',  'function',  'method',  'field',
+    'static',  'var',  'int',  'char',  'boolean',  'void',  'true',  'false',
+    'null',  'this',  'let',  'do',  'if',  'else',  'while',  'return'})
 
+# Symbols and keywords are tokenized as shared tuples, built once
+_SYMBOL_TOKENS = {symbol: (symbol, 'symbol') for symbol in SYMBOLS}
+_KEYWORD_TOKENS = {keyword: (keyword, 'keyword') for keyword in KEYWORDS}
 
-def is_string(c):
-    """Test if one character delimits the start or end of a string"""
-    return c=='"'
+# Tokens are recognized by a single regular expression, run by the `re` engine.
+# After the blanks, each alternative is a group named after the type of the 
+# tokens it matches. Any other character starts a word: an identifier or a 
+# keyword. A '"' with no closing '"' is matched on its own, as `unclosed`.
+_TOKENS = re.compile(r'\s*(?:'
+    r'(?P<symbol>[' + re.escape(''.join(sorted(SYMBOLS))) + r'])'
+    r'|(?P<integerConstant>\d+)'
+    r'|"(?P<stringConstant>[^"]*)"'
+    r'|(?P<word>[^"\s][_\w]*)'
+    r'|(?P<unclosed>"))')
 
 
-def is_keyword(string):
-    """Test if a string is a keyword"""
-    return string in {'class',  'constructor',  'function',  'method',  
-        'field',  'static',  'var',  'int',  'char',  'boolean',  
-        'void',  'true',  'false',  'null',  'this',  'let',  'do',  
-        'if',  'else',  'while',  'return'}
-
-
-def is_identifier_char(c):
-    """Test if a character is valid inside an identifier definition"""
-    return re.match('[_\w]', c) is not None
-
-
-def eat_char(chars):
-    """Return (first character of a string, the rest)"""
-    return chars[0], chars[1:]
-
-
-def eat_integer(chars, first_digit):
-    """Eat an integerConstant
+def check_integer(integer):
+    """Check that an integerConstant is in range
 
     integerConstant: a integer in the range 0...32767
     """
-    if not is_integer(chars[0]):
-        return first_digit, chars
-    i=1
-    while is_integer(chars[i]):
-        i += 1
-    if int(first_digit+chars[:i]) > 32767:
+    # Up to 4 digits, an integer cannot exceed the maximum
+    if len(integer) > 4 and int(integer) > 32767:
         raise ValueError(f"Found an integerConstant greater than 32767, which "
-        f"is the maximum: `{first_digit+chars[:i]}`.")
-    return first_digit+chars[:i], chars[i:]
+        f"is the maximum: `{integer}`.")
+    return integer
 
 
-def eat_string(chars):
-    """Eat a stringConstant
+def tag_word(word, token_type):
+    """Tag a word with a token type
 
-    stringConstant: 
-        '"' a sequence of Unicode characters, not including double quote or 
-        newline '"'
-        In token form, the enclosing '"' are omitted.
-    """
-    i=0
-    while chars[i] != '"':
-        i += 1
-    return chars[:i], chars[i+1:]
-
-
-def eat_identifier_or_keyword(chars, first_char):
-    """Eat a identifier or keyword
-
-    identifier:
-        A sequence of letters, digits and underscores ('_') not starting with a 
-        digit.
-    keyword:
-        'class' | 'constructor' | 'function' | 'method' | 'field' | 'static' 
-        | 'var' | 'int' | 'char' | 'boolean' | 'void' | 'true' | 'false' 
-        | 'null' | 'this' | 'let' | 'do' | 'if' | 'else' | 'while' | 'return'
+    Tokens are `(value, type)` tuples: on the hot paths, their value and type 
+    are read by indexing them directly rather than through getter functions.
     """
-    if not is_identifier_char(chars[0]):
-        return first_char, chars
-    i=1
-    while is_identifier_char(chars[i]):
-        i+=1
-    return first_char+chars[:i], chars[i:]
-
-
-def tag_word(word, token_type):
-    """Tag a word with a token type"""
     return (word, token_type)
 
 
-def get_token_value(token):
-    """Extract the value of a token"""
-    return token[0]
-
-
-def get_token_type(token):
-    """Extract the type of a token"""
-    return token[1]
-
-
 def tokenize(chars):
     """Recognize and split the individual tokens in `chars`
 
-    Eats `chars` progressively, one character at a time.
-    Infer the type of the current token from its first character and eat the 
-    rest of it.
+    `chars` is scanned once by the `_TOKENS` regular expression: each match is 
+    one token, typed by the name of its group. Digits are matched as `int` 
+    reads them, and words are told apart from keywords with a single lookup 
+    in `_KEYWORD_TOKENS`.
 
-    The tokens are then returned as a list of xml lines: `<type> token </type>`
+    stringConstant: 
+        '"' a sequence of Unicode characters, not including double quote or 
+        newline '"'
+        In token form, the enclosing '"' are omitted.
+
+    The tokens are then returned as a list of `(value, type)` tuples. Symbol 
+    and keyword tokens are shared tuples and the other values are interned, so 
+    that repeated tokens are stored once and compare by identity: the parser 
+    tests the shared symbol tokens with `is`.
     """
     tokens=[]
-    while len(chars) > 0:
-        c, chars = eat_char(chars)
-        if is_blank(c):
-            continue
-        if is_symbol(c):
-            tokens += [tag_word(c, 'symbol')]
-            continue
-        if is_integer(c):
-            word, chars = eat_integer(chars, c)
-            tokens += [tag_word(word, 'integerConstant')]
-            continue
-        if is_string(c):
-            word, chars = eat_string(chars)
-            tokens += [tag_word(word, 'stringConstant')]
-            continue
-        word, chars = eat_identifier_or_keyword(chars, c)
-        if is_keyword(word):
-            tokens += [tag_word(word, 'keyword')]
+    for match in _TOKENS.finditer(chars):
+        token_type = match.lastgroup
+        word = match[token_type]
+        if token_type == 'symbol':
+            tokens.append(_SYMBOL_TOKENS[word])
+        elif token_type == 'word':
+            keyword_token = _KEYWORD_TOKENS.get(word)
+            if keyword_token is not None:
+                tokens.append(keyword_token)
+            else:
+                tokens.append(tag_word(sys.intern(word), 'identifier'))
+        elif token_type == 'integerConstant':
+            tokens.append(tag_word(sys.intern(check_integer(word)), 
+                token_type))
+        elif token_type == 'stringConstant':
+            tokens.append(tag_word(sys.intern(word), token_type))
         else:
-            tokens += [tag_word(word, 'identifier')]
+            raise ValueError(f'Found a stringConstant with no closing \'"\': '
+                f'`{chars[match.start(token_type):][:20]}`')
     return tokens
 
 
@@ -308,16 +254,20 @@ def delay_scope_application(f):
     return helper
 
 
-@delay_scope_application
-def eat_by_value(scope, expected_value, expected_type,
-        optional=False, scope_key_to_update=None):
-    """Eat the specified token from `scope`.
+@lru_cache(maxsize=None)
+def eat_by_value(expected_value, expected_type, optional=False,
+        scope_key_to_update=None):
+    """Make an eater of the specified token.
 
     Multiples accepted values can be passed using a "|" separator.
-    To recognise the "|" value, "&OR" should be specified.
+    To recognise the "|" value, "&OR" should be specified. The accepted tokens 
+    are parsed once, when the eater is made, rather than on each token.
+
+    Eaters are memoized: the grammar rules are made again for every statement 
+    or expression, but they keep asking for the same few token eaters, which 
+    are then only made once.
 
     Args:
-        scope: scope to eat token from
         expected_value (str): desired token value. Multiple acceptable values 
             can be specified with a pipe "|" separator. To recognize the "|" 
             value, "&OR" should be specified.
@@ -327,29 +277,33 @@ def eat_by_value(scope, expected_value, expected_type,
         scope_key_to_update (str, default=None): scope key to write the eated 
             value onto
     Returns:
+        eater taking the scope to eat the token from and returning
         (token, rest of the scope)
     """
-    values = [v.replace('&OR', '|') for v in expected_value.split('|')]
-    if not any([scope["tokens"][0] == tag_word(v, expected_type) 
-            for v in values]):
-        if optional:
-            return None, scope
-        raise ValueError(f'Expected {expected_value} {expected_type}'
-            f' found {scope["tokens"][0]}')
-    if scope_key_to_update is None:
-        return [''], pop_token(scope)
-    return [''], set_scope_element(pop_token(scope), scope_key_to_update,
-        get_token_value(scope["tokens"][0]))
-
-
-@delay_scope_application
-def eat_by_type(scope, expected_type, optional=False, scope_key_to_update=None):
-    """Eat the specified token from `scope`.
-
-    Multiple types can be specified with a "|" separator.
+    accepted_tokens = frozenset(tag_word(v.replace('&OR', '|'), expected_type)
+        for v in expected_value.split('|'))
+    def eater(scope):
+        token = first_token(scope)
+        if token not in accepted_tokens:
+            if optional:
+                return None, scope
+            raise ValueError(f'Expected {expected_value} {expected_type}'
+                f' found {token}')
+        if scope_key_to_update is None:
+            return [], pop_token(scope)
+        return [], set_scope_element(pop_token(scope), scope_key_to_update,
+            token[0])
+    return eater
+
+
+@lru_cache(maxsize=None)
+def eat_by_type(expected_type, optional=False, scope_key_to_update=None):
+    """Make an eater of the specified token.
+
+    Multiple types can be specified with a "|" separator. As in 
+    `eat_by_value`, the types are parsed once and eaters are memoized.
 
     Args:
-        scope: scope left in the current class
         expected_type (str): desired token type. Multiple types may be 
             specified, separated with pipes "|".
         optional (bool, default=False): Action to do if desired token is not 
@@ -357,47 +311,59 @@ def eat_by_type(scope, expected_type, optional=False, scope_key_to_update=None):
         scope_key_to_update (str, default=None): scope key to write the eated 
             value onto
         Returns:
+            eater taking the scope left in the current class and returning
             (token, rest of the scope)
     """
-    types = expected_type.split('|')
-    if not any([t == get_token_type(scope["tokens"][0]) for t in types]):
-        if optional:
-            return None, scope
-        raise ValueError(f'expected token of type {expected_type}, found '
-            f'{scope["tokens"][0]}')
-    if scope_key_to_update is None:
-        return [scope["tokens"][0]], pop_token(scope)
-    return [''], set_scope_element(pop_token(scope), scope_key_to_update, 
-        get_token_value(scope["tokens"][0]))
-
-
-@delay_scope_application
-def apply_eaters(scope, *eaters, break_on_none=True):
-    """Apply specified eaters once, break if one returns `None`"""
-    eated_tokens = []
-    for eater in eaters:
-        newly_eated, scope = eater(scope)
-        if newly_eated is None:
-            if break_on_none: break
-            else: continue
-        eated_tokens += newly_eated
-    return (eated_tokens if len(eated_tokens)>0 else None), scope
-
-
-@delay_scope_application
-def eat_until_none(scope, *eaters):
-    """Apply specified eaters cyclically until one returns a `None` value"""
-    eated_tokens = []
-    for eater in eaters:
-        newly_eated, scope = eater(scope)
-        if newly_eated is None: break
-        eated_tokens += [newly_eated]
-    while newly_eated is not None:
+    accepted_types = frozenset(expected_type.split('|'))
+    def eater(scope):
+        token = first_token(scope)
+        if token[1] not in accepted_types:
+            if optional:
+                return None, scope
+            raise ValueError(f'expected token of type {expected_type}, found '
+                f'{token}')
+        if scope_key_to_update is None:
+            return [token], pop_token(scope)
+        return [], set_scope_element(pop_token(scope), scope_key_to_update, 
+            token[0])
+    return eater
+
+
+def apply_eaters(*eaters, break_on_none=True):
+    """Make an eater applying eaters once, breaking if one returns `None`
+
+    Eaters with no vm code to output return an empty list: the made eater 
+    only returns `None` if none of the eaters succeeded.
+    """
+    def apply(scope):
+        eated_tokens = []
+        eated = False
+        for eater in eaters:
+            newly_eated, scope = eater(scope)
+            if newly_eated is None:
+                if break_on_none: break
+                else: continue
+            eated = True
+            eated_tokens.extend(newly_eated)
+        return (eated_tokens if eated else None), scope
+    return apply
+
+
+def eat_until_none(*eaters):
+    """Make an eater applying eaters cyclically until one returns `None`"""
+    def apply(scope):
+        eated_tokens = []
         for eater in eaters:
             newly_eated, scope = eater(scope)
             if newly_eated is None: break
-            eated_tokens += [newly_eated]
-    return sum(eated_tokens, []), scope
+            eated_tokens.extend(newly_eated)
+        while newly_eated is not None:
+            for eater in eaters:
+                newly_eated, scope = eater(scope)
+                if newly_eated is None: break
+                eated_tokens.extend(newly_eated)
+        return eated_tokens, scope
+    return apply
 
 
 def catch_none(f):
@@ -415,11 +381,25 @@ def catch_none(f):
 #######
 
 
-def new_scope(tokens, scope_stack=None):
+class Scope:
+    """Context of the compilation, see `new_scope` for its elements
+
+    Elements are slotted attributes, read and written at fixed offsets rather 
+    than through a dictionary. Elements whose name is computed at run time are 
+    read and written with `getattr` and `set_scope_element`.
+    """
+    __slots__ = ('class_name', 'function', 'function_type', 'local', 
+        'argument', 'static', 'field', 'variables', 'sym_index', 'n_args', 
+        'loop', 'n_while', 'n_if', 'current_if', 'current_while', 'array_dest', 
+        'tokens', 'pos', 'stack', 'new_id', 'new_type', 'static_or_field', 
+        'destination', 'array_identifier', 'op')
+
+
+def new_scope(tokens):
     """Create a new scope
 
     Scope elements:
-    - class: name of the current class
+    - class_name: name of the current class
     - function: name of the current function
     - function_type: type of the current function (function|method|constructor)
     - local: variables on the `local` segment (ordered by segment index)
@@ -428,6 +408,8 @@ def new_scope(tokens, scope_stack=None):
     - field: variables on the `field` segment (ordered by segment index)
     - variables: store the `variables: type` pairs 
         class, which is not a variable.
+    - sym_index: locate the variables of the segments above: store the 
+        `variable: (vm segment, index)` pairs
     - n_args: store the amount of arguments declared in the current signature 
         (subroutine_dec)
     - loop: tracks if we are in a `if` or `while` statement.
@@ -441,80 +423,124 @@ def new_scope(tokens, scope_stack=None):
     - current_while: identifier of the current `while` loop
     - array_dest: for `let` statements, tracks if the destination is inside an
         array
-    - tokens: list of tokens yet to be eaten
-    - stack: parent scopes that are stacked, waiting for the current instruction
-        to be compiled
+    - tokens: list of all the tokens of the file, never modified
+    - pos: index of the first token yet to be eaten. Only this integer moves
+        as tokens are eaten
+    - stack: one undo frame per nesting level, each holding the values that 
+        were overwritten at this level, to be restored once the current 
+        instruction is compiled (see `unstack_scope`). `sym_index` entries 
+        are recorded one by one (see `set_sym_index_entry`)
+
+    Other elements are only set while eating, to pass eated values on to the 
+    next eaters: `new_id`, `new_type`, `static_or_field`, `destination`, 
+    `array_identifier` and `op`.
     """
-    return {
-        'class': '',
-        'function': '',
-        'function_type': '',
-        'local': [],
-        'argument': [],
-        'static': [],
-        'field': [],
-        'variables': {},
-        'n_args': 0,
-        'loop': '',
-        'n_while': -1,
-        'n_if': -1,
-        'current_if': -1,
-        'current_while': -1,
-        'array_dest': False,
-        'tokens': tokens, 
-        'stack': scope_stack}
+    scope = Scope()
+    scope.class_name = ''
+    scope.function = ''
+    scope.function_type = ''
+    scope.local = []
+    scope.argument = []
+    scope.static = []
+    scope.field = []
+    scope.variables = {}
+    scope.sym_index = {}
+    scope.n_args = 0
+    scope.loop = ''
+    scope.n_while = -1
+    scope.n_if = -1
+    scope.current_if = -1
+    scope.current_while = -1
+    scope.array_dest = False
+    scope.tokens = tokens
+    scope.pos = 0
+    scope.stack = []
+    return scope
 
 
 def inc_n_counter(scope):
     """Increment the `if` or `while` counter and set current if/while-id"""
-    scope=scope.copy()
-    scope[f'n_{scope["loop"]}'] += 1
-    scope[f'current_{scope["loop"]}'] = scope[f'n_{scope["loop"]}']
-    return [''], scope
+    loop = scope.loop
+    n = getattr(scope, f'n_{loop}') + 1
+    set_scope_element(scope, f'n_{loop}', n)
+    set_scope_element(scope, f'current_{loop}', n)
+    return [], scope
+
+
+# Undo frame marker of the elements which were not set before
+_UNSET = object()
 
 
 def set_scope_element(scope, key, value):
-    """Copy the scope and sets the desired key-value pair"""
-    scope=scope.copy()
-    scope[key] = value
+    """Set the desired scope element, in place
+
+    The first time an element is set at the current nesting level, its 
+    previous value is recorded in the level's undo frame, to be restored by 
+    `unstack_scope`.
+    """
+    if scope.stack:
+        undo = scope.stack[-1]
+        if key not in undo:
+            undo[key] = getattr(scope, key, _UNSET)
+    setattr(scope, key, value)
+    return scope
+
+
+def set_sym_index_entry(scope, identifier, location):
+    """Set the location of a variable in `sym_index`, in place
+
+    Only the previous entry of the variable is recorded in the undo frame, 
+    keyed by `('sym_index', identifier)`, rather than a copy of the whole 
+    index.
+    """
+    if scope.stack:
+        undo = scope.stack[-1]
+        key = ('sym_index', identifier)
+        if key not in undo:
+            undo[key] = scope.sym_index.get(identifier, _UNSET)
+    scope.sym_index[identifier] = location
     return scope
 
 
 @delay_scope_application
 def inc_scope_element(scope, key):
     """Increment a scope counter, typically `n_args`"""
-    scope=scope.copy()
-    scope[key] += 1
-    return [''], scope
-
-
-def clean_scope_tokens(scope):
-    """Remove the `tokens` entry from a scope"""
-    scope = scope.copy()
-    scope.pop('tokens')
-    return scope
+    return [], set_scope_element(scope, key, getattr(scope, key) + 1)
 
 
 def stack_scope(scope):
-    """Make a copy of a scope for a child and stack the parent scope in it"""
-    return set_scope_element(scope.copy(), 'stack', 
-        clean_scope_tokens(scope.copy()))
+    """Open a new nesting level, with an empty undo frame"""
+    scope.stack.append({})
+    return scope
 
 
 def unstack_scope(scope):
-    """Reset the stacked scope and update its tokens and if/while counters
-    
-    if/while counters should only be updated if we stay inside a function,
+    """Restore the values overwritten in the current nesting level
+
+    The tokens cursor is never restored: the parent resumes where the child 
+    stopped eating.
+    The if/while counters should only be kept if we stay inside a function,
     thus the check on `function_type`: it is only empty at the class-level.
+    They are only written back when the child changed them, which most 
+    children, like expressions, do not.
     """
-    tokens = scope['tokens']
-    n_if = scope['n_if']
-    n_while = scope['n_while']
-    scope = scope['stack'].copy()
-    scope['tokens'] = tokens
-    if scope['function_type'] != '':
-        scope['n_while'] = n_while
-        scope['n_if'] = n_if
+    n_if = scope.n_if
+    n_while = scope.n_while
+    for key, value in scope.stack.pop().items():
+        if type(key) is tuple: # `sym_index` entry
+            if value is _UNSET:
+                del scope.sym_index[key[1]]
+            else:
+                scope.sym_index[key[1]] = value
+        elif value is _UNSET:
+            delattr(scope, key)
+        else:
+            setattr(scope, key, value)
+    if scope.function_type != '':
+        if scope.n_while != n_while:
+            set_scope_element(scope, 'n_while', n_while)
+        if scope.n_if != n_if:
+            set_scope_element(scope, 'n_if', n_if)
     return scope
 
 
@@ -526,10 +552,17 @@ def nested_scope(f):
     return helper
 
 
+def first_token(scope):
+    """Return the first token yet to be eaten"""
+    return scope.tokens[scope.pos]
+
+
 def pop_token(scope):
-    """Remove the first token from the scope"""
-    scope = scope.copy()
-    scope['tokens'] = scope['tokens'][1:]
+    """Move the scope tokens cursor past the first token
+
+    The tokens themselves are never copied.
+    """
+    scope.pos += 1
     return scope
 
 
@@ -552,21 +585,50 @@ def no_scope(f):
 ###########
 
 
-@delay_scope_application
-def eat_type(scope, existing_classes, optional=False):
-    """Eat a token corresponding to a type
+# Eaters of the recurring tokens of the grammar, made once
+eat_opening_brace = eat_by_value('{', 'symbol')
+eat_closing_brace = eat_by_value('}', 'symbol')
+eat_opening_parenthesis = eat_by_value('(', 'symbol')
+eat_closing_parenthesis = eat_by_value(')', 'symbol')
+eat_closing_bracket = eat_by_value(']', 'symbol')
+eat_semicolon = eat_by_value(';', 'symbol')
+eat_optional_comma = eat_by_value(',', 'symbol', optional=True)
+eat_new_id = eat_by_type('identifier', scope_key_to_update='new_id')
+eat_identifier = eat_by_type('identifier')
+eat_opening_bracket = eat_by_value('[', 'symbol')
+eat_optional_dot = eat_by_value('.', 'symbol', optional=True)
+eat_optional_opening_parenthesis = eat_by_value('(', 'symbol', optional=True)
+
+# Eaters of the alternations of the grammar, their accepted values are parsed 
+# into sets once, here
+eat_static_or_field = eat_by_value('static|field', 'keyword', optional=True,
+    scope_key_to_update='static_or_field')
+eat_subroutine_kind = eat_by_value('constructor|function|method', 'keyword', 
+    optional=True, scope_key_to_update='function_type')
+eat_primitive_type = eat_by_value('int|char|boolean|void', 'keyword',
+    optional=True, scope_key_to_update='new_type')
+eat_unary_op = eat_by_value('-|~', 'symbol', scope_key_to_update='op')
+
+
+@lru_cache(maxsize=None)
+def eat_type(existing_classes, optional=False):
+    """Make an eater of a token corresponding to a type
 
     Recognized jack syntax:
     'int'|'char'|'boolean'|className
 
     First tries to eat one of the pre-defined types (int / char / boolean).
-    If unsuccessful, look for user-defined classes.
+    If unsuccessful, look for user-defined classes. The class name eater is 
+    made once, with the eater, and eaters are memoized: the existing classes 
+    are joined and parsed into an acceptance set once per compilation.
     """
-    t, scope =  eat_by_value('int|char|boolean|void','keyword',
-        optional=True, scope_key_to_update='new_type')(scope)
-    if t is not None: return t, scope
-    return eat_by_value('|'.join(existing_classes), 'identifier',
-        optional=optional, scope_key_to_update='new_type')(scope)
+    eat_class_name = eat_by_value('|'.join(existing_classes), 'identifier',
+        optional=optional, scope_key_to_update='new_type')
+    def eater(scope):
+        t, scope = eat_primitive_type(scope)
+        if t is not None: return t, scope
+        return eat_class_name(scope)
+    return eater
 
 
 @nested_scope
@@ -578,18 +640,18 @@ def eat_class(scope, existing_classes):
     
     Args:
         scope: scope to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
     return apply_eaters( 
         eat_by_value('class', 'keyword'),
-        eat_by_type('identifier', scope_key_to_update='class'),
-        eat_by_value('{', 'symbol'),
+        eat_by_type('identifier', scope_key_to_update='class_name'),
+        eat_opening_brace,
         eat_until_none(eat_class_var_dec(existing_classes)),
         eat_until_none(eat_subroutine_dec(existing_classes)),
-        eat_by_value('}', 'symbol'))(scope)
+        eat_closing_brace)(scope)
 
 
 @delay_scope_application
@@ -601,31 +663,29 @@ def eat_class_var_dec(scope, existing_classes):
      
     Args:
         scope: scope to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
     return apply_eaters(
-        eat_by_value('static|field', 'keyword', optional=True,
-            scope_key_to_update='static/field'),
+        eat_static_or_field,
         eat_type(existing_classes),
-        eat_by_type('identifier', scope_key_to_update='new_id'),
+        eat_new_id,
         add_id_to_static_or_field,
         eat_until_none(
-            eat_by_value(',', 'symbol', optional=True),
-            eat_by_type('identifier', scope_key_to_update='new_id'),
+            eat_optional_comma,
+            eat_new_id,
             add_id_to_static_or_field),
-        eat_by_value(';', 'symbol'))(scope)
+        eat_semicolon)(scope)
 
 def add_this_to_locals(scope):
     """Add the `this` keyword to the local variables"""
-    if scope['function_type'] != 'method':
-        return [''], scope
-    scope = scope.copy()
-    scope['new_id'] = 'this'
+    if scope.function_type != 'method':
+        return [], scope
+    set_scope_element(scope, 'new_id', 'this')
     _, scope = add_id_to_scope('argument')(scope)
-    return [''], scope 
+    return [], scope 
 
 
 @delay_scope_application
@@ -639,20 +699,19 @@ def eat_subroutine_dec(scope, existing_classes):
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code of the declaration, updated scope)
     """
     return apply_eaters(
-        eat_by_value('constructor|function|method', 'keyword', optional=True,
-            scope_key_to_update='function_type'),
+        eat_subroutine_kind,
         eat_type(existing_classes),
         eat_by_type('identifier', scope_key_to_update='function'),
         add_this_to_locals,
-        eat_by_value('(', 'symbol'),
+        eat_opening_parenthesis,
         eat_param_list(existing_classes),
-        eat_by_value(')', 'symbol'),
+        eat_closing_parenthesis,
         eat_sub_routine_body(existing_classes))(scope)
 
 
@@ -666,34 +725,34 @@ def eat_param_list(scope, existing_classes):
      
     Args:
         scope: scope to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code of the declaration, updated scope)
     """
     return apply_eaters(
         eat_type(existing_classes, optional=True),
-        eat_by_type('identifier', scope_key_to_update='new_id'),
+        eat_new_id,
         add_id_to_scope('argument'),
         eat_until_none(
-            eat_by_value(',', 'symbol', optional=True),
+            eat_optional_comma,
             eat_type(existing_classes),
-            eat_by_type('identifier', scope_key_to_update='new_id'),
+            eat_new_id,
             add_id_to_scope('argument')))(scope)
 
 
 @no_scope_update
 def generate_function_declaration(scope):
     """Generate the vm code for a function declaration"""
-    n_locals = len(scope['local'])
+    n_locals = len(scope.local)
     function_declaration = [
-        f'function {scope["class"]}.{scope["function"]} {n_locals}']
-    if scope['function_type'] == 'constructor':
+        f'function {scope.class_name}.{scope.function} {n_locals}']
+    if scope.function_type == 'constructor':
         function_declaration += [
-            f'push constant {len(scope["field"])}',
+            f'push constant {len(scope.field)}',
             'call Memory.alloc 1',
             'pop pointer 0']
-    elif scope['function_type'] == 'method':
+    elif scope.function_type == 'method':
         function_declaration += ['push argument 0', 'pop pointer 0']
     return function_declaration
 
@@ -707,37 +766,50 @@ def eat_sub_routine_body(scope, existing_classes):
      
     Args:
         scope: scope to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
     return apply_eaters(
-        eat_by_value('{', 'symbol'),
+        eat_opening_brace,
         eat_until_none(eat_var_dec(existing_classes)),
         generate_function_declaration,
         eat_statements(existing_classes),
-        eat_by_value('}', 'symbol'))(scope)
+        eat_closing_brace)(scope)
+
+
+# vm segments of the variables, by lookup priority
+_SEGMENTS = ('local', 'argument', 'this', 'static')
+
+
+def add_variable(scope, segment):
+    """Add the `new_id` variable to a segment and index its location
+
+    A variable declared in several segments is located in the first of the 
+    local, argument, field and static segments, at its first index there.
+    """
+    identifier = scope.new_id
+    variables = getattr(scope, segment)
+    set_scope_element(scope, segment, variables + [identifier])
+    vm_segment = 'this' if segment == 'field' else segment
+    located = scope.sym_index.get(identifier)
+    if (located is None 
+            or _SEGMENTS.index(vm_segment) < _SEGMENTS.index(located[0])):
+        set_sym_index_entry(scope, identifier, (vm_segment, len(variables)))
+    scope.variables[identifier] = scope.new_type
+    return [], set_scope_element(scope, 'new_id', '')
 
 
 @delay_scope_application
 def add_id_to_scope(scope, segment):
     """Add a new variable to the scope, for `local` or `argument` segments"""
-    scope=scope.copy()
-    scope[segment] = scope[segment] + [scope['new_id']]
-    scope['variables'][scope['new_id']] = scope['new_type']
-    scope['new_id'] = ''
-    return [''], scope
+    return add_variable(scope, segment)
 
 
 def add_id_to_static_or_field(scope):
     """Add a new variable to the scope, for `static` or `field` segments"""
-    scope=scope.copy()
-    meta_type = scope['static/field']
-    scope[meta_type] = scope[meta_type] + [scope['new_id']]
-    scope['variables'][scope['new_id']] = scope['new_type']
-    scope['new_id'] = ''
-    return [''], scope
+    return add_variable(scope, scope.static_or_field)
 
 
 @delay_scope_application
@@ -749,7 +821,7 @@ def eat_var_dec(scope, existing_classes):
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
@@ -757,13 +829,13 @@ def eat_var_dec(scope, existing_classes):
     return apply_eaters(
         eat_by_value('var', 'keyword', optional=True),
         eat_type(existing_classes),
-        eat_by_type('identifier', scope_key_to_update='new_id'),
+        eat_new_id,
         add_id_to_scope('local'),
         eat_until_none(
-            eat_by_value(',', 'symbol', optional=True),
-            eat_by_type('identifier', scope_key_to_update='new_id'),
+            eat_optional_comma,
+            eat_new_id,
             add_id_to_scope('local')),
-        eat_by_value(';', 'symbol'))(scope)
+        eat_semicolon)(scope)
 
 
 ############
@@ -771,6 +843,18 @@ def eat_var_dec(scope, existing_classes):
 ############
 
 
+# Eaters of the tokens of the straight-line statements, made once
+eat_while_keyword = eat_by_value('while', 'keyword', scope_key_to_update='loop')
+eat_let_keyword = eat_by_value('let', 'keyword')
+eat_destination = eat_by_type('identifier', scope_key_to_update='destination')
+eat_optional_array_destination = eat_by_value('[', 'symbol', optional=True,
+    scope_key_to_update='array_dest')
+eat_equal_sign = eat_by_value('=', 'symbol')
+eat_do_keyword = eat_by_value('do', 'keyword')
+eat_return_keyword = eat_by_value('return', 'keyword', 
+    scope_key_to_update='op')
+
+
 @delay_scope_application
 def eat_statements(scope, existing_classes):
     """Eat tokens corresponding to statements
@@ -780,7 +864,7 @@ def eat_statements(scope, existing_classes):
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
@@ -795,25 +879,21 @@ def eat_statement(scope, existing_classes):
     Recognized jack syntax:
         ifStatement | whileStatement | letStatement | doStatement 
             | returnStatement
+
+    The statement is dispatched on its first token (see `STATEMENT_EATERS`) 
+    instead of comparing it against each keyword in turn.
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
-    if scope["tokens"][0] == tag_word('if', 'keyword'):
-        return eat_if_statement(existing_classes)(scope)
-    if scope["tokens"][0] == tag_word('while', 'keyword'):
-        return eat_while_statement(existing_classes)(scope)
-    if scope["tokens"][0] == tag_word('let', 'keyword'):
-        return eat_let_statement(existing_classes)(scope)
-    if scope["tokens"][0] == tag_word('do', 'keyword'):
-        return eat_do_statement()(scope)
-    if scope["tokens"][0] == tag_word('return', 'keyword'):
-        return eat_return_statement(scope)
-    return None, scope
+    make_statement_eater = STATEMENT_EATERS.get(first_token(scope))
+    if make_statement_eater is None:
+        return None, scope
+    return make_statement_eater(existing_classes)(scope)
 
 
 @delay_scope_application
@@ -826,7 +906,7 @@ def eat_if_statement(scope, existing_classes):
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
@@ -834,74 +914,56 @@ def eat_if_statement(scope, existing_classes):
     return apply_eaters(
         eat_by_value('if', 'keyword', scope_key_to_update='loop'),
         inc_n_counter,
-        eat_by_value('(', 'symbol'),
-        eat_expression(optional=True),
-        eat_by_value(')', 'symbol'),
+        eat_opening_parenthesis,
+        eat_optional_expression,
+        eat_closing_parenthesis,
         generate_if_goto,
         generate_true_label,
-        eat_by_value('{', 'symbol'),
+        eat_opening_brace,
         eat_statements(existing_classes),
-        eat_by_value('}', 'symbol'),
+        eat_closing_brace,
         generate_end_goto,
         generate_false_label,
         eat_by_value('else', 'keyword', optional=True),
-        eat_by_value('{', 'symbol'),
+        eat_opening_brace,
         eat_statements(existing_classes),
-        eat_by_value('}', 'symbol'),
+        eat_closing_brace,
         generate_end_label)(scope)
 
 
-@no_scope_update
-def generate_start_label(scope):
-    """Generate a `start` label for `while` statements"""
-    return [f'label WHILE_EXP{scope["current_while"]}']
-
-
 @no_scope_update
 def generate_end_label(scope):
     """Generate a `end` label for `if`/`while` statements"""
-    name=scope['loop']
-    return [f'label {name.upper()}_END{scope["current_"+name]}']
+    name=scope.loop
+    return [f'label {name.upper()}_END{getattr(scope, "current_"+name)}']
 
 
 @no_scope_update
 def generate_true_label(scope):
     """Generate a `true` label for `if` statements"""
-    return [f'label IF_TRUE{scope["current_if"]}']
+    return [f'label IF_TRUE{scope.current_if}']
 
 
 @no_scope_update
 def generate_false_label(scope):
     """Generate a `false` label for `if` statements"""
-    return [f'label IF_FALSE{scope["current_if"]}']
-
-
-@no_scope_update
-def generate_continue_goto(scope):
-    """Generate a "continue" instruction for `while` statements"""
-    return [f'goto WHILE_EXP{scope["current_while"]}']
+    return [f'label IF_FALSE{scope.current_if}']
 
 
 @no_scope_update
 def generate_if_goto(scope):
     """Generate the true/false switch instruction for `if` statements"""
-    return [f'if-goto IF_TRUE{scope["current_if"]}',
-            f'goto IF_FALSE{scope["current_if"]}']
-
-@no_scope_update
-def generate_break_goto(scope):
-    """Generate a "break" instruction for `while` statements"""
-    return [f'if-goto WHILE_END{scope["current_while"]}']
-
+    return [f'if-goto IF_TRUE{scope.current_if}',
+            f'goto IF_FALSE{scope.current_if}']
 
 @no_scope_update
 def generate_end_goto(scope):
     """Generate a "skip-else" instruction for `if` statements
 
     This instruction should only be generated if there is an `else` part"""
-    if get_token_value(scope['tokens'][0]) == 'else':
-        return [f'goto IF_END{scope["current_if"]}']
-    return ['']
+    if first_token(scope)[0] == 'else':
+        return [f'goto IF_END{scope.current_if}']
+    return []
 
 
 @delay_scope_application
@@ -911,60 +973,65 @@ def eat_while_statement(scope, existing_classes):
 
     Recognized jack syntax:
         'while' '(' expression ')’ '{' statements '}’
+
+    The structure of the statement is fixed: its eaters are called in 
+    sequence, without going through `apply_eaters`. As there, eating stops 
+    after the opening parenthesis if no condition is found.
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
-    return apply_eaters(
-        eat_by_value('while', 'keyword', scope_key_to_update='loop'),
-        inc_n_counter,
-        generate_start_label,
-        eat_by_value('(', 'symbol'),
-        eat_expression(optional=True),
-        eat_by_value(')', 'symbol'),
-        insert_vm_code('not'),
-        generate_break_goto,
-        eat_by_value('{', 'symbol'),
-        eat_statements(existing_classes),
-        eat_by_value('}', 'symbol'),
-        generate_continue_goto,
-        generate_end_label)(scope)
-
-
-def get_segment(scope, identifier):
-    return [s for s in ['local', 'argument', 'field', 'static']
-        if identifier in scope[s]][0]
+    _, scope = eat_while_keyword(scope)
+    _, scope = inc_n_counter(scope)
+    vm_lines = [f'label WHILE_EXP{scope.current_while}']
+    _, scope = eat_opening_parenthesis(scope)
+    condition, scope = eat_optional_expression(scope)
+    if condition is None:
+        return vm_lines, scope
+    vm_lines.extend(condition)
+    _, scope = eat_closing_parenthesis(scope)
+    vm_lines.append('not')
+    vm_lines.append(f'if-goto WHILE_END{scope.current_while}')
+    _, scope = eat_opening_brace(scope)
+    body, scope = eat_statements(existing_classes)(scope)
+    vm_lines.extend(body)
+    _, scope = eat_closing_brace(scope)
+    vm_lines.append(f'goto WHILE_EXP{scope.current_while}')
+    vm_lines.append(f'label WHILE_END{scope.current_while}')
+    return vm_lines, scope
 
 
 def pop_destination(scope):
     """Generate a `pop` instruction to the scoped `destination` variable
 
     Arrays are managed with the `array_dest` key in scope"""
-    segment = get_segment(scope, scope["destination"])
-    index = scope[segment].index(scope["destination"])
-    if not scope['array_dest']:
-        return [f'pop {segment} {index}'.replace('field', 'this')], scope
-    scope = scope.copy()
-    scope['array_dest'] = False
+    segment, index = scope.sym_index[scope.destination]
+    if not scope.array_dest:
+        return [f'pop {segment} {index}'], scope
+    set_scope_element(scope, 'array_dest', False)
     return ['pop temp 0', 'pop pointer 1', 'push temp 0', 'pop that 0'], scope
 
 
-@delay_scope_application
 def push_identifier(scope, identifier):
-    """Generate a `push` instruction for the desired identifier"""
-    segment = get_segment(scope, identifier)
-    index = scope[segment].index(identifier)
-    return [f'push {segment} {index}'.replace('field', 'this')], scope
+    """Generate a `push` instruction for the desired identifier
+
+    Called directly by the other eaters, not through `apply_eaters`.
+    """
+    segment, index = scope.sym_index[identifier]
+    return [f'push {segment} {index}'], scope
 
 
 @delay_scope_application
 def point_array(scope, key_to_identifier):
     """Generate instructions corresponding to an array-lookup"""
-    return push_identifier(scope[key_to_identifier])(scope)[0] + ['add'], scope
+    identifier = getattr(scope, key_to_identifier)
+    vm_lines, scope = push_identifier(scope, identifier)
+    vm_lines.append('add')
+    return vm_lines, scope
 
 
 @delay_scope_application
@@ -972,29 +1039,35 @@ def eat_let_statement(scope, existing_classes):
     """Eat tokens corresponding to a let statement
 
     Recognized jack syntax:
-        'let' varName '=' expression ';'
+        'let' varName ('[' expression ']')? '=' expression ';'
+
+    The structure of the statement is fixed: its eaters are called in 
+    sequence, without going through `apply_eaters`.
      
     Args:
         scope: tokens to analyse a class declaration from
-        existing_classes (list): list of class names existing in the scope of
+        existing_classes (tuple): class names existing in the scope of
             the program. They should thus be recognized as valid data types.
     Returns:
         (vm code for the declaration, updated scope)
     """
-    return apply_eaters(
-        eat_by_value('let', 'keyword'),
-        eat_by_type('identifier', scope_key_to_update='destination'),
-        apply_eaters(
-            eat_by_value('[', 'symbol', optional=True,
-                scope_key_to_update='array_dest'),
-            eat_expression(),
-            eat_by_value(']', 'symbol'),
-            point_array('destination')),
-        eat_by_value('=', 'symbol'),
-        eat_expression(),
-        eat_by_value(';', 'symbol'),
-        pop_destination,
-        break_on_none=False)(scope)
+    _, scope = eat_let_keyword(scope)
+    _, scope = eat_destination(scope)
+    vm_lines = []
+    bracket, scope = eat_optional_array_destination(scope)
+    if bracket is not None:
+        index, scope = eat_expression(scope)
+        vm_lines.extend(index)
+        _, scope = eat_closing_bracket(scope)
+        pointer, scope = point_array('destination')(scope)
+        vm_lines.extend(pointer)
+    _, scope = eat_equal_sign(scope)
+    value, scope = eat_expression(scope)
+    vm_lines.extend(value)
+    _, scope = eat_semicolon(scope)
+    pop, scope = pop_destination(scope)
+    vm_lines.extend(pop)
+    return vm_lines, scope
 
 
 @delay_scope_application
@@ -1004,34 +1077,24 @@ def insert_vm_code(code):
     return [code]
 
 
-@delay_scope_application
 def eat_do_statement(scope):
     """Eat tokens corresponding to a do statement
 
     Recognized jack syntax:
         'do' subroutineCall ';'
+
+    The eaters are called in sequence, without going through `apply_eaters`.
      
     Args:
         scope: tokens to analyse a class declaration from
     Returns:
         (vm code for the declaration, updated scope)
     """
-    return apply_eaters(
-        eat_by_value('do', 'keyword'),
-        eat_subroutine_call(),
-        eat_by_value(';', 'symbol'),
-        insert_vm_code('pop temp 0'))(scope)
-
-
-@delay_scope_application
-def fill_empty_returns(scope, expression_getter):
-    """Catch empty returns and make them return `0`
-
-    In the vm, all functions have to return something"""
-    expression, scope = expression_getter(scope)
-    if expression is None:
-        return insert_vm_code('push constant 0')(scope)
-    return expression, scope
+    _, scope = eat_do_keyword(scope)
+    vm_lines, scope = eat_subroutine_call(scope)
+    _, scope = eat_semicolon(scope)
+    vm_lines.append('pop temp 0')
+    return vm_lines, scope
 
 
 @nested_scope
@@ -1041,18 +1104,32 @@ def eat_return_statement(scope):
     Recognized jack syntax:
         returnStatemen: 'return' expression? ';'
 
+    The eaters are called in sequence, without going through `apply_eaters`.
+    In the vm, all functions have to return something: empty returns return 
+    `0`.
+
     Args:
         scope: tokens to analyse a class declaration from
     Returns:
         (vm code for the declaration, updated scope)
     """
-    return apply_eaters(
-        eat_by_value('return', 'keyword', 
-            scope_key_to_update='op'),
-        fill_empty_returns(eat_expression(optional=True)),
-        eat_by_value(';', 'symbol'),
-        insert_vm_code('return'),
-        break_on_none=False)(scope)
+    _, scope = eat_return_keyword(scope)
+    vm_lines, scope = eat_optional_expression(scope)
+    if vm_lines is None:
+        vm_lines = ['push constant 0']
+    _, scope = eat_semicolon(scope)
+    vm_lines.append('return')
+    return vm_lines, scope
+
+
+# Statement eater makers, by the keyword token starting the statement
+STATEMENT_EATERS = {
+    tag_word('if', 'keyword'): eat_if_statement,
+    tag_word('while', 'keyword'): eat_while_statement,
+    tag_word('let', 'keyword'): eat_let_statement,
+    tag_word('do', 'keyword'): lambda existing_classes: eat_do_statement,
+    tag_word('return', 'keyword'): 
+        lambda existing_classes: eat_return_statement}
 
 
 #############
@@ -1062,7 +1139,7 @@ def eat_return_statement(scope):
 
 def empty_callback(scope):
     """A neutral function in the context of `apply_eaters`"""
-    return [''], scope
+    return [], scope
 
 
 @delay_scope_application
@@ -1080,39 +1157,56 @@ def eat_expression_list(scope, callback=empty_callback):
         (vm code for the declaration, updated scope)
     """
     return apply_eaters(
-        eat_expression(optional=True),
+        eat_optional_expression,
         callback,
         eat_until_none(
-            eat_by_value(',', 'symbol', optional=True),
-            eat_expression(),
+            eat_optional_comma,
+            eat_expression,
             callback))(scope)
 
 
-@no_scope_update
-def generate_op_instruction(scope):
-    """Generate vm code corresponding to the operation in the `op` scope key"""
-    return {
-        '+': ['add'],
-        '-': ['sub'],
-        '*': ['call Math.multiply 2'],
-        '/': ['call Math.divide 2'],
-        '&': ['and'],
-        '|': ['or'],
-        '=': ['eq'],
-        '>': ['gt'],
-        '<': ['lt'],
-    }[scope['op']]
+# vm code of the operations and keyword constants. The code is shared between 
+# all its uses: it is stored in tuples, so that it can only be read, copied or 
+# extended into another list.
+_OP_VM = {
+    '+': ('add',),
+    '-': ('sub',),
+    '*': ('call Math.multiply 2',),
+    '/': ('call Math.divide 2',),
+    '&': ('and',),
+    '|': ('or',),
+    '=': ('eq',),
+    '>': ('gt',),
+    '<': ('lt',),
+}
+_UNARY_OP_VM = {
+    '-': ('neg',),
+    '~': ('not',),
+}
+_KEYWORD_CONSTANT_VM = {
+    'true': ('push constant 0', 'not'),
+    'false': ('push constant 0',),
+    'null': ('push constant 0',),
+    'this': ('push pointer 0',),
+}
+
+# Accepted tokens of the operations and keyword constants
+_OP_TOKENS = frozenset(tag_word(op, 'symbol') for op in _OP_VM)
+_UNARY_OP_TOKENS = frozenset(tag_word(op, 'symbol') for op in _UNARY_OP_VM)
+_KEYWORD_CONSTANT_TOKENS = frozenset(tag_word(keyword, 'keyword') 
+    for keyword in _KEYWORD_CONSTANT_VM)
+
+# Shared tokens following an identifier in array accesses and subroutine calls
+_OPENING_BRACKET_TOKEN = _SYMBOL_TOKENS['[']
+_CALL_TOKENS = frozenset({_SYMBOL_TOKENS['.'], _SYMBOL_TOKENS['(']})
 
 
 @no_scope_update
 def generate_unary_op_instruction(scope):
     """Generate vm code corresponding to the operation in the `op` scope key"""
-    return {
-        '-': ['neg'],
-        '~': ['not']}[scope['op']]
+    return _UNARY_OP_VM[scope.op]
 
 
-@delay_scope_application
 @nested_scope
 def eat_expression(scope, optional=False):
     """Eat tokens corresponding to an expression
@@ -1120,47 +1214,66 @@ def eat_expression(scope, optional=False):
     Recognized jack syntax:
          term (op term)*
 
+    Expressions are eaten for nearly every statement: the terms and operations 
+    are eaten by direct calls, rather than by a pipeline of delayed eaters 
+    made again for every expression. Each operation is compiled from the `op` 
+    scope key once its second term is eaten.
+
     Args:
         scope: tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
         (vm code for the declaration, updated scope)
     """
-    return apply_eaters(
-        eat_term(optional=optional),
-        eat_until_none(
-            eat_op(optional=True, scope_key_to_update='op'),
-            eat_term(),
-            generate_op_instruction))(scope)
+    term, scope = eat_term(scope, optional)
+    if term is None:
+        return None, scope
+    vm_lines = list(term)
+    while True:
+        op, scope = eat_op(scope, optional=True, scope_key_to_update='op')
+        if op is None:
+            return vm_lines, scope
+        term, scope = eat_term(scope)
+        vm_lines.extend(term)
+        vm_lines.extend(_OP_VM[scope.op])
+
+
+def eat_optional_expression(scope):
+    """Eat an expression if there is one, see `eat_expression`"""
+    return eat_expression(scope, optional=True)
 
 
-@delay_scope_application
 def eat_op(scope, optional=False, scope_key_to_update=None):
     """Eat tokens corresponding to an operation symbol
 
     Recognized jack syntax:
         '+'|'-'|i'*'|'/'|'&'|'|'|'='|'>'|'<'
 
+    The token is directly looked up in `_OP_TOKENS`, as operations are eaten 
+    between every two terms.
+
     Args:
         scope: tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
         (vm code for the declaration, updated scope)
     """
+    token = first_token(scope)
+    if token not in _OP_TOKENS:
+        if optional:
+            return None, scope
+        raise ValueError(f'Expected +|-|*|/|&|&OR|=|>|< symbol found {token}')
     if scope_key_to_update is None:
-        return eat_by_value('+|-|*|/|&|&OR|=|>|<', 'symbol', 
-            optional=optional)(scope)
-    return eat_by_value('+|-|*|/|&|&OR|=|>|<', 'symbol', 
-        optional=optional, scope_key_to_update=scope_key_to_update
-    )(scope)
+        return [], pop_token(scope)
+    return [], set_scope_element(pop_token(scope), scope_key_to_update, 
+        token[0])
 
 
 def is_a_class(scope, identifier):
     """Check if an identifier is a variable or a class name"""
-    return identifier not in scope['variables'].keys()
+    return identifier not in scope.variables
 
 
-@delay_scope_application
 @nested_scope
 def eat_subroutine_call(scope):
     """Eat tokens corresponding to a sub-routine call
@@ -1169,42 +1282,48 @@ def eat_subroutine_call(scope):
         subroutineName '(' expressionList ')' 
             | (className|varname)'.'subroutineName'('expressionList')'
 
+    The call instructions are appended to the freshly made list of vm code of 
+    the arguments, rather than concatenated into copies of it.
+
     Args:
         scope: tokens to analyse a class declaration from
     Returns:
         (vm code for the declaration, updated scope)
     """
-    identifier, scope = eat_by_type('identifier')(scope)
-    dot, scope = eat_by_value('.', 'symbol', 
-        optional=True)(scope)
+    identifier, scope = eat_identifier(scope)
+    dot, scope = eat_optional_dot(scope)
     if dot is not None:
-        callee, scope = eat_by_type('identifier')(scope)
+        callee, scope = eat_identifier(scope)
     else:
         callee=None
     arguments, scope = apply_eaters(
-        eat_by_value('(', 'symbol'),
+        eat_opening_parenthesis,
         eat_expression_list(callback=inc_scope_element('n_args')),
-        eat_by_value(')', 'symbol')
+        eat_closing_parenthesis
     )(scope)
 
     if dot is None:
         # subroutineName '(' expressionList ')' syntax
-        func_call = scope['class'] + '.' + get_token_value(identifier[0])
-        return ['push pointer 0'] + arguments + [
-            f'call {func_call} {scope["n_args"] + 1}'], scope
+        func_call = scope.class_name + '.' + identifier[0][0]
+        vm_lines = ['push pointer 0']
+        vm_lines.extend(arguments)
+        vm_lines.append(f'call {func_call} {scope.n_args + 1}')
+        return vm_lines, scope
 
     # (className|varname)'.'subroutineName'('expressionList')' syntax
-    caller = get_token_value(identifier[0])
-    callee = get_token_value(callee[0])
+    caller = identifier[0][0]
+    callee = callee[0][0]
     if is_a_class(scope, caller):
         func_call = caller+ '.' + callee
-        return arguments + [f'call {func_call} {scope["n_args"]}'], scope
-    var_class=scope['variables'][caller]
-    return push_identifier(caller)(scope)[0] + arguments + [
-        f'call {var_class+ "." + callee} {scope["n_args"] + 1}'], scope
+        arguments.append(f'call {func_call} {scope.n_args}')
+        return arguments, scope
+    var_class=scope.variables[caller]
+    vm_lines, scope = push_identifier(scope, caller)
+    vm_lines.extend(arguments)
+    vm_lines.append(f'call {var_class+ "." + callee} {scope.n_args + 1}')
+    return vm_lines, scope
 
 
-@delay_scope_application
 def eat_term(scope, optional=False):
     """Eat tokens corresponding to a term
 
@@ -1213,83 +1332,72 @@ def eat_term(scope, optional=False):
             | varName'['expression']' | subroutineCall | '('expression')' 
             | unaryOp term
 
+    The alternative is chosen from the first token, and the one after it for 
+    identifiers: no alternative is eaten then given back to try the next one.
+
     Args:
         scope: tokens to analyse a class declaration from
         optional (bool): continue silently if no expression wath found
     Returns:
         (vm code for the declaration, updated scope)
     """
-    initial_scope = scope.copy()
+    tokens, i = scope.tokens, scope.pos
+    value, token_type = tokens[i]
 
     # integerConstant syntax
-    integer_constant, scope = eat_by_type('integerConstant', 
-        optional=True)(scope)
-    if integer_constant is not None:
-        return [f'push constant {get_token_value(integer_constant[0])}'], scope 
+    if token_type == 'integerConstant':
+        return [f'push constant {value}'], pop_token(scope)
 
-    # integerConstant syntax
-    string_constant, scope = eat_by_type('stringConstant', 
-        optional=True)(scope)
-    if string_constant is not None:
-        string = get_token_value(initial_scope['tokens'][0])
-        return [f'push constant {len(string)}', 'call String.new 1'] + sum([
-            [f'push constant {ord(s)}', 'call String.appendChar 2']
-            for s in string
-        ], []), scope
+    # stringConstant syntax
+    if token_type == 'stringConstant':
+        vm_lines = [f'push constant {len(value)}', 'call String.new 1']
+        for c in value:
+            vm_lines.append(f'push constant {ord(c)}')
+            vm_lines.append('call String.appendChar 2')
+        return vm_lines, pop_token(scope)
 
     # keywordConstant: 'true'|'false'|'null'|'this'
-    is_keyword, scope = eat_by_value('true|false|null|this', 'keyword', 
-        optional=True)(scope)
-    if is_keyword is not None:
-        return {
-            'true': ['push constant 0', 'not'],
-            'false': ['push constant 0'],
-            'null': ['push constant 0'],
-            'this': ['push pointer 0']
-        }[get_token_value(initial_scope['tokens'][0])], scope
+    if tokens[i] in _KEYWORD_CONSTANT_TOKENS:
+        return _KEYWORD_CONSTANT_VM[value], pop_token(scope)
 
     # varName|varName'['expression']|subroutineCall'
-    identifier, scope = eat_by_type('identifier', optional=True)(
-        scope)
-    if identifier is not None:
-        if scope["tokens"][0] == tag_word('[', 'symbol'):
+    if token_type == 'identifier':
+        next_token = tokens[i+1]
+        if next_token is _OPENING_BRACKET_TOKEN:
             return apply_eaters(
                 eat_by_type('identifier', optional=True, 
                     scope_key_to_update='array_identifier'),
-                eat_by_value('[', 'symbol'),
-                eat_expression(),
+                eat_opening_bracket,
+                eat_expression,
                 point_array('array_identifier'),
-                eat_by_value(']', 'symbol'),
+                eat_closing_bracket,
                 insert_vm_code('pop pointer 1'),
                 insert_vm_code('push that 0')
-            )(initial_scope)
-        if (scope["tokens"][0] == tag_word('.', 'symbol') 
-                or scope["tokens"][0] == tag_word('(', 'symbol')):
-            return eat_subroutine_call()(initial_scope)
-        return push_identifier(get_token_value(identifier[0]))(scope)
+            )(scope)
+        if next_token in _CALL_TOKENS:
+            return eat_subroutine_call(scope)
+        return push_identifier(pop_token(scope), value)
 
     # '('expression')'
     expression, scope = apply_eaters(
-        eat_by_value('(', 'symbol', optional=True),
-        eat_expression(),
-        eat_by_value(')', 'symbol'))(scope)
+        eat_optional_opening_parenthesis,
+        eat_expression,
+        eat_closing_parenthesis)(scope)
     if expression is not None:
         return expression, scope
 
     # unaryOp term
     # unaryOp: '-'|'~'
-    unary_term, scope = apply_eaters(
-        eat_by_value('-|~', 'symbol', optional=True, 
-            scope_key_to_update='op'),
-        eat_term(),
-        generate_unary_op_instruction)(scope)
-    if unary_term is not None:
-        return unary_term, scope
+    if tokens[i] in _UNARY_OP_TOKENS:
+        return apply_eaters(
+            eat_unary_op,
+            eat_term,
+            generate_unary_op_instruction)(scope)
 
     if optional:
         return None, scope
     
-    raise ValueError(f'Expected a term, found `{scope["tokens"][:5]}...`')
+    raise ValueError(f'Expected a term, found `{tokens[i:i+5]}...`')
 
 
 #############
@@ -1297,29 +1405,57 @@ def eat_term(scope, optional=False):
 #############
 
 
-def remove_empty_instructions(tokens):
-    return [token for token in tokens if len(token) > 0]
-
+def process_file(file_path, existing_classes, output):
+    """Read, tokenize and compile a file, streaming the vm lines to `output`
 
-def process_file(file_path, existing_classes):
-    """Read, tokenize, compile and clean a file"""
-    return '\n'.join(remove_empty_instructions(eat_class(
-       new_scope(tokenize(read_file(file_path))),existing_classes)[0])) + '\n'
+    Eaters never output empty instructions, so the vm code is written as is.
 
+    Args:
+        file_path (Path): jack file to compile
+        existing_classes (tuple): class names existing in the scope of
+            the program. It should be built once for all the files: the type 
+            eaters made from it are memoized, and turn it into an acceptance 
+            set.
+        output: writable text stream, like an opened file or `sys.stdout`
+    """
+    vm_lines, _ = eat_class(new_scope(tokenize(read_file(file_path))),
+        existing_classes)
+    output.writelines(line + '\n' for line in vm_lines)
+
+
+def compile_file(file_path, existing_classes):
+    """Compile a jack file into its respective `.vm` file"""
+    output_file = Path(file_path.parent.expanduser() 
+        / file_path.name.replace('.jack', '.vm'))
+    print('Compiling', file_path.name, flush=True)
+    with output_file.open('w') as output:
+        process_file(file_path, existing_classes, output)
+
+
+def main():
+    """Compile the jack file or folder given on the command line"""
+    project_path = Path(sys.argv[1])
+
+    # The folder is scanned once, for both the class names and the files to 
+    # compile
+    jack_files = tuple(project_path.parent.glob('*.jack'))
+    existing_classes = ('Math', 'String', 'Array', 'Output', 'Screen', 
+        'Keyboard', 'Memory', 'Sys') + tuple(f.stem for f in jack_files)
+
+    if project_path.is_file(): # Single file translation
+        process_file(project_path, existing_classes, sys.stdout)
+    else: # Folder
+        compile_jack_file = partial(compile_file,
+            existing_classes=existing_classes)
+        # The files are independent: they are compiled in parallel, unless
+        # starting the worker processes cannot pay off
+        if len(jack_files) > 1 and (os.cpu_count() or 1) > 1:
+            with Pool() as pool:
+                pool.map(compile_jack_file, jack_files)
+        else:
+            for file_path in jack_files:
+                compile_jack_file(file_path)
 
-project_path = Path(sys.argv[1])
-
-existing_classes = ['Math', 'String', 'Array', 'Output', 'Screen', 'Keyboard',
-    'Memory', 'Sys'] + [
-    f.name[:-5] # Remove the `.jack` extention
-    for f in project_path.parent.glob('*.jack')]
 
-if project_path.is_file(): # Single file translation
-    print(process_file(project_path, existing_classes))
-else: # Folder
-    to_process = project_path.parent.glob('*.jack')
-    for file_path in to_process:
-        output_file = Path(file_path.parent.expanduser() 
-            / file_path.name.replace('.jack', '.vm'))
-        print('Compiling', file_path.name)
-        output_file.write_text(process_file(file_path, existing_classes))
+if __name__ == '__main__':
+    main()